@@ -1,11 +1,63 @@
 from django.contrib import admin
-from .models import Book
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import ValidationError
+from .models import Book, BookFacet
+
+
+class FacetListFilter(admin.SimpleListFilter):
+    """
+    Sidebar filter whose choices and counts come from BookFacet,
+    instead of a DISTINCT query over the whole Book table.
+    """
+    facet_kind = None
+
+    def lookups(self, request, model_admin):
+        facets = BookFacet.objects.filter(kind=self.facet_kind).values_list('value', 'count')
+        return [(value, f"{value} ({count})") for value, count in self.sort(facets)]
+
+    def sort(self, facets):
+        return facets
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            try:
+                return queryset.filter(**{self.parameter_name: self.value()})
+            except (ValueError, ValidationError) as exc:
+                # Same as the built-in filters: the changelist redirects with ?e=1.
+                raise IncorrectLookupParameters(exc)
+        return queryset
+
+
+class PublicationYearFilter(FacetListFilter):
+    title = 'publication year'
+    parameter_name = 'publication_year'
+    facet_kind = BookFacet.YEAR
+
+    def sort(self, facets):
+        return sorted(facets, key=lambda facet: int(facet[0]), reverse=True)
+
+
+class AuthorFilter(FacetListFilter):
+    title = 'author'
+    parameter_name = 'author'
+    facet_kind = BookFacet.AUTHOR
+
 
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'publication_year')
     
     search_fields = ('title', 'author')
     
-    list_filter = ('publication_year', 'author')
+    list_filter = (PublicationYearFilter, AuthorFilter)
+
+    # The filter labels already carry the precomputed counts.
+    show_facets = admin.ShowFacets.NEVER
+
+
+class BookFacetAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'value', 'count')
+    list_filter = ('kind',)
+    search_fields = ('value',)
 
 admin.site.register(Book, BookAdmin)
+admin.site.register(BookFacet, BookFacetAdmin)
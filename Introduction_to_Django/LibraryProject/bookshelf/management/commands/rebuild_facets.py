@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookshelf.models import BookFacet
+
+
+class Command(BaseCommand):
+    help = 'Recount the precomputed year/author facets from the Book table'
+
+    def handle(self, *args, **options):
+        count = BookFacet.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} facets'))
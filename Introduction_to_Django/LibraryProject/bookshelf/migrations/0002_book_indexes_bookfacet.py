@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:00
+
+from django.db import migrations, models
+
+
+def count_existing_books(apps, schema_editor):
+    Book = apps.get_model('bookshelf', 'Book')
+    BookFacet = apps.get_model('bookshelf', 'BookFacet')
+    facets = [
+        BookFacet(kind='year', value=str(row['publication_year']), count=row['count'])
+        for row in Book.objects.values('publication_year').annotate(count=models.Count('id'))
+    ]
+    facets += [
+        BookFacet(kind='author', value=row['author'], count=row['count'])
+        for row in Book.objects.values('author').annotate(count=models.Count('id'))
+    ]
+    BookFacet.objects.bulk_create(facets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookshelf', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('year', 'Publication year'), ('author', 'Author')], max_length=10)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['kind', 'value'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publication_year', 'title'], name='book_year_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author', 'publication_year'], name='book_author_year_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookfacet',
+            constraint=models.UniqueConstraint(fields=('kind', 'value'), name='unique_book_facet'),
+        ),
+        migrations.RunPython(count_existing_books, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,117 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 
 # Create your models here.
 class Book(models.Model):
     title = models.CharField(max_length=200) #with a maximum length of 200 characters.
     author = models.CharField(max_length=100) # CharField with a maximum length of 100 characters.
-    publication_year = models.IntegerField() 
+    publication_year = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            # Year range browsing, and author filters sorted by year.
+            models.Index(fields=['publication_year', 'title'], name='book_year_title_idx'),
+            models.Index(fields=['author', 'publication_year'], name='book_author_year_idx'),
+        ]
+
+
+class BookFacet(models.Model):
+    """
+    Precomputed number of books per publication year and per author.
+
+    Kept up to date by the Book signals below, so facet sidebars read a few
+    rows from here instead of running DISTINCT/GROUP BY over every book.
+    Bulk operations skip signals; run `manage.py rebuild_facets` after them.
+    """
+    YEAR = 'year'
+    AUTHOR = 'author'
+    KIND_CHOICES = [
+        (YEAR, 'Publication year'),
+        (AUTHOR, 'Author'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'value'], name='unique_book_facet'),
+        ]
+        ordering = ['kind', 'value']
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.value} ({self.count})"
+
+    @classmethod
+    def facet_values(cls, book):
+        return {cls.YEAR: str(book.publication_year), cls.AUTHOR: book.author}
+
+    @classmethod
+    def adjust(cls, kind, value, delta):
+        updated = cls.objects.filter(kind=kind, value=value).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(kind=kind, value=value, count=delta)
+            except IntegrityError:
+                # A concurrent first save created the row; count on it instead.
+                cls.objects.filter(kind=kind, value=value).update(count=F('count') + delta)
+        elif delta < 0:
+            cls.objects.filter(kind=kind, value=value, count__lte=0).delete()
+
+    @classmethod
+    def rebuild(cls):
+        """Recount every facet from the Book table."""
+        facets = [
+            cls(kind=cls.YEAR, value=str(row['publication_year']), count=row['count'])
+            for row in Book.objects.values('publication_year').annotate(count=models.Count('id'))
+        ]
+        facets += [
+            cls(kind=cls.AUTHOR, value=row['author'], count=row['count'])
+            for row in Book.objects.values('author').annotate(count=models.Count('id'))
+        ]
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(facets)
+        return len(facets)
+
+
+@receiver(pre_save, sender=Book)
+def remember_book_facets(sender, instance, **kwargs):
+    """
+    Keep the stored year/author so post_save can move the counts
+    """
+    instance._previous_facets = None
+    if instance.pk:
+        previous = Book.objects.filter(pk=instance.pk).values('publication_year', 'author').first()
+        if previous:
+            instance._previous_facets = BookFacet.facet_values(Book(**previous))
+
+
+@receiver(post_save, sender=Book)
+def update_book_facets(sender, instance, created, **kwargs):
+    """
+    Move facet counts from the old year/author to the new ones
+    """
+    current = BookFacet.facet_values(instance)
+    previous = getattr(instance, '_previous_facets', None) or {}
+    with transaction.atomic():
+        for kind, value in current.items():
+            if previous.get(kind) == value:
+                continue
+            if kind in previous:
+                BookFacet.adjust(kind, previous[kind], -1)
+            BookFacet.adjust(kind, value, 1)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_facets(sender, instance, **kwargs):
+    """
+    Drop the deleted book from its facet counts
+    """
+    with transaction.atomic():
+        for kind, value in BookFacet.facet_values(instance).items():
+            BookFacet.adjust(kind, value, -1)
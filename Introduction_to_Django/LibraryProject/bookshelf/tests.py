@@ -1,3 +1,87 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Book, BookFacet
+
+
+def facet_counts(kind):
+    return dict(BookFacet.objects.filter(kind=kind).values_list('value', 'count'))
+
+
+class BookFacetTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='1984', author='George Orwell', publication_year=1949)
+        Book.objects.create(title='Animal Farm', author='George Orwell', publication_year=1945)
+
+    def test_counts_follow_create_update_delete(self):
+        self.assertEqual(facet_counts(BookFacet.AUTHOR), {'George Orwell': 2})
+
+        self.book.publication_year = 1945
+        self.book.author = 'Orwell'
+        self.book.save()
+        self.assertEqual(facet_counts(BookFacet.YEAR), {'1945': 2})
+        self.assertEqual(facet_counts(BookFacet.AUTHOR), {'George Orwell': 1, 'Orwell': 1})
+
+        self.book.delete()
+        self.assertEqual(facet_counts(BookFacet.AUTHOR), {'George Orwell': 1})
+
+    def test_rebuild_matches_signals(self):
+        Book.objects.bulk_create([Book(title='Emma', author='Jane Austen', publication_year=1815)])
+        BookFacet.rebuild()
+        self.assertEqual(facet_counts(BookFacet.YEAR), {'1815': 1, '1945': 1, '1949': 1})
+
+
+class BrowseBooksTests(TestCase):
+    def setUp(self):
+        for year in range(1900, 1960):
+            Book.objects.create(title=f'Book {year}', author='A' if year % 2 else 'B', publication_year=year)
+
+    def test_year_range_author_filter_and_pagination(self):
+        response = self.client.get(reverse('browse_books'), {'year_min': 1910, 'year_max': 1919, 'author': 'A'})
+        self.assertEqual([book.publication_year for book in response.context['page']], [1911, 1913, 1915, 1917, 1919])
+
+        response = self.client.get(reverse('browse_books'), {'page': 3})
+        self.assertEqual(response.context['page'].object_list[0].publication_year, 1950)
+
+    def test_sidebar_does_not_group_books(self):
+        with self.assertNumQueries(3):  # page count, page rows, facets
+            response = self.client.get(reverse('browse_books'))
+        self.assertContains(response, 'A (30)')
+
+
+class FacetAdminFilterTests(TestCase):
+    def test_filter_choices_come_from_facets(self):
+        Book.objects.create(title='Emma', author='Jane Austen', publication_year=1815)
+        admin_user = User.objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:bookshelf_book_changelist'), {'publication_year': '1815'})
+        self.assertContains(response, '1815 (1)')
+        self.assertContains(response, 'Jane Austen (1)')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_bad_filter_value_redirects(self):
+        Book.objects.create(title='Emma', author='Jane Austen', publication_year=1815)
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        url = reverse('admin:bookshelf_book_changelist')
+        response = self.client.get(url, {'publication_year': 'abc'})
+        self.assertRedirects(response, f'{url}?e=1')
+
+
+class BookFacetConcurrencyTests(TestCase):
+    def test_lost_create_race_still_counts(self):
+        # Another writer creates the facet between our update and our create.
+        BookFacet.objects.create(kind=BookFacet.YEAR, value='1999', count=1)
+        update = QuerySet.update
+        calls = []
+
+        def first_update_misses(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
 
-# Create your tests here.
+        with mock.patch.object(QuerySet, 'update', first_update_misses):
+            BookFacet.adjust(BookFacet.YEAR, '1999', 1)
+        self.assertEqual(BookFacet.objects.get(kind=BookFacet.YEAR, value='1999').count, 2)
@@ -1,2 +1,58 @@
+from django.core.paginator import Paginator
 from django.shortcuts import render
+
+from .models import Book, BookFacet
+
 # Create your views here.
+
+BOOKS_PER_PAGE = 25
+
+
+def parse_year(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def browse_books(request):
+    """
+    Faceted book browsing: ?year_min=&year_max=&author=&author=&page=
+
+    Results come from the indexed Book columns; the sidebar counts come
+    from BookFacet so no GROUP BY runs on the book table.
+    """
+    year_min = parse_year(request.GET.get('year_min'))
+    year_max = parse_year(request.GET.get('year_max'))
+    authors = [author for author in request.GET.getlist('author') if author]
+
+    books = Book.objects.only('title', 'author', 'publication_year')
+    if year_min is not None:
+        books = books.filter(publication_year__gte=year_min)
+    if year_max is not None:
+        books = books.filter(publication_year__lte=year_max)
+    if authors:
+        books = books.filter(author__in=authors)
+    books = books.order_by('publication_year', 'title')
+
+    page = Paginator(books, BOOKS_PER_PAGE).get_page(request.GET.get('page'))
+
+    facets = {BookFacet.YEAR: [], BookFacet.AUTHOR: []}
+    for facet in BookFacet.objects.all():
+        facets[facet.kind].append(facet)
+    facets[BookFacet.YEAR].sort(key=lambda facet: int(facet.value))
+
+    # Query string without the page number, for the pagination links.
+    query = request.GET.copy()
+    query.pop('page', None)
+
+    context = {
+        'page': page,
+        'year_facets': facets[BookFacet.YEAR],
+        'author_facets': facets[BookFacet.AUTHOR],
+        'year_min': year_min,
+        'year_max': year_max,
+        'authors': authors,
+        'query': query.urlencode(),
+    }
+    return render(request, 'bookshelf/browse.html', context)
@@ -0,0 +1,167 @@
+"""
+Response compression for LibraryProject.
+
+Configured through the RESPONSE_COMPRESSION setting:
+
+    RESPONSE_COMPRESSION = {
+        'ENCODINGS': ['br', 'gzip'],  # preference order
+        'MIN_SIZE': 1024,             # bytes; smaller bodies are sent as-is
+        'GZIP_LEVEL': 6,
+        'BROTLI_QUALITY': 4,
+    }
+
+Brotli is used only when the optional ``brotli`` package is installed.
+Streaming responses are compressed chunk by chunk and flushed after each
+chunk, so clients still receive the first bytes early.
+
+Like django.middleware.gzip, gzip bodies carry a random-length filename in
+their header (up to max_random_bytes) as a BREACH mitigation. Django's own
+compress_string()/compress_sequence() fix the level at 6 and do not flush
+per chunk, so the padding is reproduced here.
+"""
+
+import re
+import secrets
+import struct
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULTS = {
+    'ENCODINGS': ['br', 'gzip'],
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+}
+
+# Images, archives and fonts are already compressed.
+COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(json|javascript|xml|xhtml\+xml)|image/svg\+xml)')
+
+
+def gzip_header(level, max_random_bytes):
+    """A gzip member header whose FNAME field is 0 to max_random_bytes - 1 bytes long."""
+    extra_flags = 2 if level == 9 else 4 if level == 1 else 0
+    filename = b'a' * secrets.randbelow(max_random_bytes) if max_random_bytes else b''
+    # Magic, deflate, FNAME flag, mtime 0, extra flags, OS unknown.
+    return struct.pack('<BBBBLBB', 0x1f, 0x8b, 8, 0x08, 0, extra_flags, 255) + filename + b'\x00'
+
+
+def gzip_stream(chunks, level, max_random_bytes=None):
+    yield gzip_header(level, max_random_bytes)
+    # Raw deflate; the header and the CRC32/size trailer are written here.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = size = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush() + struct.pack('<LL', crc, size & 0xffffffff)
+
+
+def brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def negotiate(accept_encoding, encodings):
+    """
+    Return the first of ``encodings`` the Accept-Encoding header allows
+    (q > 0), or None.
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in encodings:
+        if accepted.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Compress responses with the best encoding the client accepts."""
+
+    # Same BREACH padding as django.middleware.gzip.GZipMiddleware.
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = {**DEFAULTS, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+        self.encodings = [
+            encoding for encoding in config['ENCODINGS']
+            if encoding == 'gzip' or (encoding == 'br' and brotli is not None)
+        ]
+        self.min_size = config['MIN_SIZE']
+        self.gzip_level = config['GZIP_LEVEL']
+        self.brotli_quality = config['BROTLI_QUALITY']
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Async iterators are left alone rather than consumed here.
+                return response
+            response.streaming_content = self.compress_stream(encoding, response.streaming_content)
+            response.headers.pop('Content-Length', None)
+        else:
+            if len(response.content) < self.min_size:
+                return response
+            compressed = self.compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The body changed, so a strong ETag no longer matches it.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compressible(self, response):
+        return (
+            response.status_code == 200
+            and not response.has_header('Content-Encoding')
+            and COMPRESSIBLE_TYPES.match(response.get('Content-Type', ''))
+        )
+
+    def negotiate(self, accept_encoding):
+        return negotiate(accept_encoding, self.encodings)
+
+    def compress(self, encoding, content):
+        if encoding == 'br':
+            return brotli.compress(content, quality=self.brotli_quality)
+        return b''.join(gzip_stream([content], self.gzip_level, self.max_random_bytes))
+
+    def compress_stream(self, encoding, chunks):
+        if encoding == 'br':
+            return brotli_stream(chunks, self.brotli_quality)
+        return gzip_stream(chunks, self.gzip_level, self.max_random_bytes)
@@ -0,0 +1,381 @@
+"""
+Prometheus-style metrics for LibraryProject, exposed at /metrics.
+
+Configured through the METRICS setting:
+
+    METRICS = {
+        'ENABLED': True,
+        # Directory shared by all worker processes. Each process rewrites a
+        # snapshot of its counters there after every request and /metrics
+        # adds them all up. Leave as None for a single-process server.
+        'MULTIPROCESS_DIR': None,
+        'CATALOG_COUNT_TTL': 60,   # seconds catalog/session gauges are cached
+        # Who may read /metrics: client addresses or networks, or anyone
+        # sending 'Authorization: Bearer <TOKEN>'.
+        'ALLOWED_IPS': ['127.0.0.1', '::1'],
+        'TOKEN': None,
+    }
+
+Snapshots of processes that have exited are folded into one file
+(exited.json) on the next scrape, so recycled workers do not grow the
+directory and their counts are kept.
+
+Collected:
+    library_http_requests_total{view,method,status}
+    library_http_request_duration_seconds{view}      (histogram)
+    library_db_queries_total{view}
+    library_db_query_duration_seconds_total{view}
+    library_cache_requests_total{cache,result}       (Instrumented* caches)
+    library_ratelimit_rejections_total{scope}
+    library_active_sessions, library_catalog_objects{model}   (gauges)
+"""
+
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files import locks
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': None,
+    'CATALOG_COUNT_TTL': 60,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': None,
+}
+
+EXITED = 'exited.json'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_TYPES = {
+    'library_http_requests_total': ('counter', 'HTTP requests by URL name, method and status.'),
+    'library_http_request_duration_seconds': ('histogram', 'Time spent producing a response, by URL name.'),
+    'library_db_queries_total': ('counter', 'Database queries run while handling requests, by URL name.'),
+    'library_db_query_duration_seconds_total': ('counter', 'Time spent in database queries, by URL name.'),
+    'library_cache_requests_total': ('counter', 'Cache reads by cache alias and hit/miss.'),
+    'library_ratelimit_rejections_total': ('counter', 'Requests rejected by the rate limiter, by scope.'),
+    'library_active_sessions': ('gauge', 'Unexpired sessions (cached).'),
+    'library_catalog_objects': ('gauge', 'Rows per catalog model (cached).'),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class Registry:
+    """Counters and histograms for one process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.histograms = {}
+        # Unique per process: a pid can be reused by a later worker, which
+        # would otherwise overwrite the earlier worker's counts.
+        self.filename = f'{os.getpid()}-{uuid.uuid4().hex}.json'
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # One slot per bucket plus +Inf, then sum.
+                histogram = self.histograms[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+            histogram[bisect_left(DURATION_BUCKETS, value)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def flush(self, directory):
+        """Atomically replace this process's snapshot in ``directory``."""
+        write_snapshot(os.path.join(directory, self.filename), self.snapshot())
+
+
+registry = Registry()
+
+# Workers forked from a preloaded master start from zero, not the master's counts.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def write_snapshot(path, snapshot):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # being replaced or truncated; next scrape picks it up
+
+
+def merge(snapshots):
+    """Add up snapshots into ({(name, labels): value}, {(name, labels): buckets})."""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+    return counters, histograms
+
+
+def process_exited(filename):
+    """True if the process that wrote snapshot ``filename`` (<pid>-<id>.json) is gone."""
+    pid = filename.partition('-')[0]
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # PermissionError: alive, but owned by another user
+    return False
+
+
+def fold_exited(directory):
+    """
+    Add the snapshots of exited processes to EXITED and delete them.
+    Counters must never go down, so their counts are kept, not dropped.
+    Only one scrape folds at a time; the others skip it.
+    """
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        if not locks.lock(lock_file, locks.LOCK_EX | locks.LOCK_NB):
+            return
+        try:
+            exited = [
+                os.path.join(directory, filename) for filename in os.listdir(directory)
+                if filename.endswith('.json') and process_exited(filename)
+            ]
+            if not exited:
+                return
+            path = os.path.join(directory, EXITED)
+            snapshots = [snapshot for snapshot in map(read_snapshot, [path, *exited]) if snapshot is not None]
+            counters, histograms = merge(snapshots)
+            write_snapshot(path, {
+                'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                'histograms': [[name, list(labels), values] for (name, labels), values in histograms.items()],
+            })
+            for filename in exited:
+                os.remove(filename)
+        finally:
+            locks.unlock(lock_file)
+
+
+def collect(directory):
+    """Merge every process's snapshot (and this process's live one)."""
+    snapshots = []
+    if directory and os.path.isdir(directory):
+        fold_exited(directory)
+        for filename in os.listdir(directory):
+            if filename.endswith('.json') and filename != registry.filename:
+                snapshot = read_snapshot(os.path.join(directory, filename))
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+    snapshots.append(registry.snapshot())
+    return merge(snapshots)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render(counters, histograms, gauges):
+    samples = {}
+    for (name, labels), value in sorted(counters.items()):
+        samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {value}')
+    for (name, labels), values in sorted(histograms.items()):
+        lines = samples.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS + ('+Inf',), values[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+        lines.append(f'{name}_sum{format_labels(labels)} {values[-1]}')
+        lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    for (name, labels), value in sorted(gauges.items()):
+        samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {value}')
+
+    output = []
+    for name in sorted(samples):
+        kind, help_text = METRIC_TYPES[name]
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(samples[name])
+    return '\n'.join(output) + '\n'
+
+
+def catalog_gauges():
+    """Session and catalog row counts, cached so scrapes stay cheap."""
+    gauges = default_cache.get('metrics:catalog_gauges')
+    if gauges is None:
+        from django.contrib.sessions.models import Session
+        from relationship_app.sharding import catalog_counts
+
+        gauges = [
+            ['library_active_sessions', [], Session.objects.filter(expire_date__gt=timezone.now()).count()],
+        ]
+        for model_name, count in catalog_counts().items():
+            gauges.append(['library_catalog_objects', [['model', model_name]], count])
+        default_cache.set('metrics:catalog_gauges', gauges, get_config()['CATALOG_COUNT_TTL'])
+    return {(name, tuple(tuple(label) for label in labels)): value for name, labels, value in gauges}
+
+
+def allowed(request, config):
+    """Whether ``request`` may read /metrics: a matching bearer token or an allowed address."""
+    token = config['TOKEN']
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in config['ALLOWED_IPS'])
+
+
+def metrics_view(request):
+    config = get_config()
+    if not allowed(request, config):
+        return HttpResponseForbidden()
+    counters, histograms = collect(config['MULTIPROCESS_DIR'])
+    return HttpResponse(render(counters, histograms, catalog_gauges()), content_type=CONTENT_TYPE)
+
+
+class QueryCounter:
+    """connection.execute_wrapper hook counting queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Count and time every request by its URL name. Put it first in MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = get_config()
+        self.enabled = config['ENABLED']
+        self.directory = config['MULTIPROCESS_DIR']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with self.count_queries(queries):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            # Streamed pages run most of their queries while being sent.
+            response.streaming_content = self.finish_stream(
+                response.streaming_content, request, response, queries, start,
+            )
+        else:
+            self.record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    def count_queries(self, queries):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(queries))
+        return stack
+
+    def finish_stream(self, content, request, response, queries, start):
+        try:
+            with self.count_queries(queries):
+                yield from content
+        finally:
+            self.record(request, response, queries, time.perf_counter() - start)
+
+    def record(self, request, response, queries, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        registry.inc('library_http_requests_total', {
+            'view': view, 'method': request.method, 'status': str(response.status_code),
+        })
+        registry.observe('library_http_request_duration_seconds', {'view': view}, duration)
+        registry.inc('library_db_queries_total', {'view': view}, queries.count)
+        registry.inc('library_db_query_duration_seconds_total', {'view': view}, queries.duration)
+        if self.directory:
+            registry.flush(self.directory)
+
+
+class InstrumentedCacheMixin:
+    """Count hits and misses per cache alias (get_many() goes through get())."""
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_alias = params.get('OPTIONS', {}).get('METRICS_ALIAS', location or 'default')
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        hit = value is not self._missing
+        registry.inc('library_cache_requests_total', {'cache': self.metrics_alias, 'result': 'hit' if hit else 'miss'})
+        return value if hit else default
+
+    _missing = object()
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedFileBasedCache(InstrumentedCacheMixin, FileBasedCache):
+    pass
@@ -0,0 +1,67 @@
+"""
+Warm-up hook for pre-fork servers (gunicorn --preload, uWSGI without
+lazy-apps).
+
+preload() runs once in the master process, after the WSGI application is
+loaded and before any worker is forked. Everything it imports or compiles
+is inherited by every worker and shared copy-on-write, so workers start
+ready to serve instead of each paying for it on their first requests.
+
+With gunicorn, gunicorn.conf.py next to manage.py wires it up:
+
+    gunicorn -c gunicorn.conf.py LibraryProject.wsgi
+"""
+
+import gc
+import os
+
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+
+def template_dirs(engine):
+    """Directories searched by the engine's loaders, including app directories."""
+    loaders = getattr(getattr(engine, 'engine', None), 'template_loaders', None)
+    if loaders is None:
+        return engine.template_dirs
+    return [directory for loader in loaders for directory in loader.get_dirs()]
+
+
+def template_names(engine):
+    """Yield the name of every .html template the engine can find."""
+    for directory in template_dirs(engine):
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith('.html'):
+                    yield os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+
+
+def preload(freeze=True):
+    """
+    Import and compile what workers would otherwise load lazily.
+    Returns {'templates': n} for logging.
+    """
+    # URLconf, every view module and the reverse() lookup tables.
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+
+    # Compiled templates stay in the cached loader, when one is configured.
+    templates = 0
+    for engine in engines.all():
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                continue  # a broken template still fails loudly when it is used
+            templates += 1
+
+    # Workers must open their own database connections.
+    connections.close_all()
+
+    if freeze:
+        # Keep the garbage collector in each worker from touching (and so
+        # copying) the objects built above.
+        gc.freeze()
+    return {'templates': templates}
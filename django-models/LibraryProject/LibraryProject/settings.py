@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,7 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LibraryProject.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'LibraryProject.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -70,6 +73,64 @@ TEMPLATES = [
 WSGI_APPLICATION = 'LibraryProject.wsgi.application'
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# locmem is per process. When running several workers, point 'ratelimit' at
+# a shared cache with an atomic incr() so they count together, e.g.
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#   'LOCATION': 'redis://127.0.0.1:6379',
+# FileBasedCache is shared as well, but its incr() is not atomic across
+# processes, so concurrent requests can slip past the limits.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'LibraryProject.metrics.InstrumentedLocMemCache',
+        'OPTIONS': {'METRICS_ALIAS': 'default'},
+    },
+    'ratelimit': {
+        'BACKEND': 'LibraryProject.metrics.InstrumentedLocMemCache',
+        'LOCATION': 'ratelimit',
+        'OPTIONS': {'METRICS_ALIAS': 'ratelimit'},
+    },
+}
+
+
+# Rate limiting
+# See relationship_app/ratelimit.py.
+
+RATELIMIT = {
+    'ENABLED': True,
+    'CACHE': 'ratelimit',
+    'IP_META_KEY': 'REMOTE_ADDR',
+}
+
+
+# Metrics
+# See LibraryProject/metrics.py. Under gunicorn (or any pre-fork server) set
+# LIBRARY_METRICS_DIR to a directory shared by the workers, emptied on deploy.
+# /metrics answers localhost only; scrapers elsewhere send
+# 'Authorization: Bearer $LIBRARY_METRICS_TOKEN' or are added to ALLOWED_IPS.
+
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': os.environ.get('LIBRARY_METRICS_DIR'),
+    'CATALOG_COUNT_TTL': 60,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': os.environ.get('LIBRARY_METRICS_TOKEN'),
+}
+
+
+# Response compression
+# See LibraryProject/compression.py. 'br' is skipped unless brotli is installed.
+
+RESPONSE_COMPRESSION = {
+    'ENCODINGS': ['br', 'gzip'],
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+}
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -80,6 +141,12 @@ DATABASES = {
     }
 }
 
+# Libraries (with their memberships and librarian) are spread over these
+# aliases; see relationship_app/sharding.py and settings_sharded.py.
+DATABASE_ROUTERS = ['relationship_app.sharding.ShardRouter']
+
+LIBRARY_SHARDS = ['default']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -112,11 +179,20 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Authentication redirects go to named routes so they follow the URLconf.
+
+LOGIN_URL = 'login'
+LOGIN_REDIRECT_URL = 'book_list'
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
 
+# Where `manage.py collectstatic` gathers files for deployment.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
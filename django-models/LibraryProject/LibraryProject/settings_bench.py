@@ -0,0 +1,20 @@
+"""
+Django settings for load tests and benchmark runs.
+
+Usage:
+    python manage.py seed_users 5000 --settings=LibraryProject.settings_bench
+
+Same cheap hasher and caches as the test profile, but backed by a separate
+SQLite file so seeded data survives between commands.
+"""
+
+from .settings_test import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    }
+}
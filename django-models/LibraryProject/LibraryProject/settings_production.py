@@ -0,0 +1,62 @@
+"""
+Django settings for containerized LibraryProject deployments.
+
+Usage:
+    DJANGO_SETTINGS_MODULE=LibraryProject.settings_production
+    python manage.py collectstatic --noinput
+
+Secrets and hosts come from the environment. Static files are collected
+with content-hashed names, precompressed, and served by the app itself.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+
+# Static files
+# Hashed names (styles.3f2a9c.css) can be cached forever by browsers and
+# proxies; StaticFilesMiddleware serves the .br/.gz variants directly.
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'LibraryProject.static.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Right after SecurityMiddleware, so static responses still get its
+# nosniff/HSTS headers but skip sessions, auth and CSRF.
+_security = MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1
+MIDDLEWARE = [
+    *MIDDLEWARE[:_security],
+    'LibraryProject.static.StaticFilesMiddleware',
+    *MIDDLEWARE[_security:],
+]
+
+
+# Templates
+# Compile each template once per process.
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
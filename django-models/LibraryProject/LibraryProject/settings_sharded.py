@@ -0,0 +1,30 @@
+"""
+Django settings with libraries sharded over two extra SQLite files.
+
+Usage:
+    python manage.py migrate --settings=LibraryProject.settings_sharded
+    python manage.py migrate --database=shard_0 --settings=LibraryProject.settings_sharded
+    python manage.py migrate --database=shard_1 --settings=LibraryProject.settings_sharded
+    python manage.py shard_libraries --settings=LibraryProject.settings_sharded
+
+The catalog, users and sessions stay in db.sqlite3. Each library, its
+memberships and its librarian move to shard_0.sqlite3 or shard_1.sqlite3
+by the hash of the library's name (see relationship_app/sharding.py).
+"""
+
+from .settings import *  # noqa: F401,F403
+
+
+DATABASES = {
+    **DATABASES,
+    'shard_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard_0.sqlite3',
+    },
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard_1.sqlite3',
+    },
+}
+
+LIBRARY_SHARDS = ['shard_0', 'shard_1']
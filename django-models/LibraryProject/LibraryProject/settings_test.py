@@ -0,0 +1,97 @@
+"""
+Django settings for running the LibraryProject test suite and benchmarks.
+
+Usage:
+    python manage.py test --settings=LibraryProject.settings_test
+
+Builds on the regular settings and swaps in cheap backends so that creating
+thousands of users or fixtures does not dominate the run time.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+
+# Password hashing
+# PBKDF2 is deliberately slow; MD5 is fine for throwaway test accounts.
+# https://docs.djangoproject.com/en/5.2/topics/testing/overview/#password-hashing
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+AUTH_PASSWORD_VALIDATORS = []
+
+
+# Database
+# In-memory SQLite, created fresh for every run. The shard aliases are only
+# created for tests that ask for them (see relationship_app.tests.ShardingTests).
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'shard_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+
+# Caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library-test',
+    },
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library-test-ratelimit',
+    },
+}
+
+
+# Templates
+# Compile each template once per process instead of re-reading it on every
+# render; the explicit loaders list replaces APP_DIRS.
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+
+# Debug tooling
+# Keep debug-only apps and middleware out of test and benchmark runs.
+
+DEBUG_ONLY_APPS = ('debug_toolbar',)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEBUG_ONLY_APPS]
+
+MIDDLEWARE = [m for m in MIDDLEWARE if not m.startswith(DEBUG_ONLY_APPS)]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'null': {'class': 'logging.NullHandler'}},
+    'root': {'handlers': ['null']},
+}
@@ -0,0 +1,163 @@
+"""
+Static file storage and serving for LibraryProject deployments.
+
+CompressedManifestStaticFilesStorage writes content-hashed copies of every
+asset during ``collectstatic`` plus ``.gz`` (and ``.br`` when the optional
+``brotli`` package is installed) variants next to them.
+
+StaticFilesMiddleware serves those files straight from STATIC_ROOT so a
+container can run without a separate web server in front of it. Hashed
+names never change content, so they are sent with far-future cache headers.
+"""
+
+import gzip
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_http_date_safe
+
+from .compression import negotiate
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Formats that are already compressed and gain nothing from another pass.
+SKIP_COMPRESS_EXTENSIONS = {
+    '.br', '.gz', '.zip', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif',
+    '.woff', '.woff2', '.mp3', '.mp4', '.webm',
+}
+
+FOREVER = 'public, max-age=31536000, immutable'
+SHORT = 'public, max-age=60'
+
+
+def compress_file(path):
+    """Write .gz/.br variants of ``path`` when they are meaningfully smaller."""
+    if os.path.splitext(path)[1].lower() in SKIP_COMPRESS_EXTENSIONS:
+        return
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also precompresses collected files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths)
+        names.update(self.hashed_files.values())
+        for name in sorted(names):
+            compress_file(self.path(name))
+
+
+class StaticFile:
+    """A collected file and its precompressed variants."""
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.mtime = int(stat.st_mtime)
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.cache_control = FOREVER if immutable else SHORT
+        self.encodings = [
+            (encoding, path + suffix)
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+            if os.path.exists(path + suffix)
+        ]
+        # Each body gets its own strong ETag, so a cache never answers a
+        # gzip request with a 304 for the identity body or the other way round.
+        etag = f'{self.mtime:x}-{self.size:x}'
+        self.etags = {None: f'"{etag}"'}
+        self.etags.update((encoding, f'"{etag}-{encoding}"') for encoding, _ in self.encodings)
+
+    def pick(self, accept_encoding):
+        """Return (path, encoding) of the best variant the client accepts."""
+        paths = dict(self.encodings)
+        encoding = negotiate(accept_encoding, list(paths))
+        return paths.get(encoding, self.path), encoding
+
+
+class StaticFilesMiddleware:
+    """Serve STATIC_ROOT from the WSGI/ASGI app, WhiteNoise-style.
+
+    Files are indexed once at startup, so a lookup is a dict hit and
+    requests outside STATIC_URL pass straight through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        root = settings.STATIC_ROOT
+        if not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.files = self.scan(str(root))
+
+    def scan(self, root):
+        hashed = set()
+        manifest = os.path.join(root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                hashed.update(json.load(f).get('paths', {}).values())
+
+        files = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')) or filename == 'staticfiles.json':
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                files[self.prefix + name] = StaticFile(path, immutable=name in hashed)
+        return files
+
+    def __call__(self, request):
+        static_file = None
+        if request.path.startswith(self.prefix) and request.method in ('GET', 'HEAD'):
+            static_file = self.files.get(request.path)
+        if static_file is None:
+            return self.get_response(request)
+        return self.serve(request, static_file)
+
+    def serve(self, request, static_file):
+        path, encoding = static_file.pick(request.headers.get('Accept-Encoding', ''))
+        etag = static_file.etags[encoding]
+        if self.not_modified(request, static_file, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            response.headers.pop('Content-Disposition', None)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.headers['Content-Length'] = os.path.getsize(path)
+        response.headers['Cache-Control'] = static_file.cache_control
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = static_file.last_modified
+        if static_file.encodings:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def not_modified(self, request, static_file, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in if_none_match
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return since is not None and static_file.mtime <= since
@@ -17,8 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('books/', include('relationship_app.urls')),
-    path('auth/', include('relationship_app.urls')),
-]
\ No newline at end of file
+]
@@ -0,0 +1,12 @@
+# gunicorn -c gunicorn.conf.py LibraryProject.wsgi
+#
+# Load the application once in the master and warm it before forking, so
+# workers share its modules and compiled templates copy-on-write.
+
+preload_app = True
+
+
+def when_ready(server):
+    from LibraryProject.preload import preload
+
+    server.log.info('Preloaded the URLconf and %(templates)d templates', preload())
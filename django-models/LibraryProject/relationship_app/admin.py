@@ -1,8 +1,97 @@
+from urllib.parse import parse_qs, urlencode
+
 from django.contrib import admin
+from .archive import archive_authors, archive_libraries
 from .models import Library, Librarian, Book, Author, UserProfile
+from .sharding import shard_aliases
+
+
+class ArchiveInsteadOfDeleteMixin:
+    """
+    Replace admin deletes with archiving: a cascading delete (and the
+    confirmation page that lists every dependent row) is too expensive for
+    big authors and libraries. Archived rows are purged later in batches by
+    `manage.py purge_archived`.
+    """
+    archive_function = None
+    actions = ['archive_selected']
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Archive selected %(verbose_name_plural)s', permissions=['change'])
+    def archive_selected(self, request, queryset):
+        count = type(self).archive_function(queryset)
+        self.message_user(request, f'Archived {count} {self.opts.verbose_name_plural}.')
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Pick the shard a sharded changelist shows (the first one by default)."""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def choices(self, changelist):
+        current = self.value() or shard_aliases()[0]
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == current,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset  # already on the right shard; see ShardedModelAdmin.get_queryset
 
 
-class AuthorAdmin(admin.ModelAdmin):
+class ShardedModelAdmin(admin.ModelAdmin):
+    """
+    Admin for models spread over LIBRARY_SHARDS (see sharding.py).
+
+    The changelist shows one shard at a time, picked with ShardFilter. Change
+    and add pages find it in the preserved changelist filters, so primary
+    keys, which are only unique within a shard, always mean the right row.
+    """
+    show_full_result_count = False
+
+    def get_list_filter(self, request):
+        return (ShardFilter, *super().get_list_filter(request))
+
+    def get_shard(self, request):
+        shard = request.GET.get(ShardFilter.parameter_name)
+        if shard is None:
+            preserved = parse_qs(request.GET.get('_changelist_filters', ''))
+            shard = preserved.get(ShardFilter.parameter_name, [None])[0]
+        return shard if shard in shard_aliases() else shard_aliases()[0]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(self.get_shard(request))
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # A new row lands on the shard the router picks, which need not be
+        # the one being browsed; follow it.
+        request.saved_to_shard = obj._state.db
+
+    def get_preserved_filters(self, request):
+        preserved = super().get_preserved_filters(request)
+        shard = getattr(request, 'saved_to_shard', None)
+        if shard is None:
+            return preserved
+        filters = parse_qs(parse_qs(preserved).get('_changelist_filters', [''])[0])
+        filters[ShardFilter.parameter_name] = [shard]
+        return urlencode({'_changelist_filters': urlencode(filters, doseq=True)})
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model is Library:
+            kwargs['queryset'] = Library.objects.using(self.get_shard(request))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class AuthorAdmin(ArchiveInsteadOfDeleteMixin, admin.ModelAdmin):
+    archive_function = archive_authors
     list_display = ('name',)
     search_fields = ('name',)
 
@@ -16,20 +105,28 @@ class BookAdmin(admin.ModelAdmin):
     get_Author_name.short_description = 'Author'
 
 
-class LibraryAdmin(admin.ModelAdmin):
+class LibraryAdmin(ArchiveInsteadOfDeleteMixin, ShardedModelAdmin):
+    archive_function = archive_libraries
     list_display = ('name', 'get_books_count')
     filter_horizontal = ('books',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # The name picks the shard; renaming would strand the library.
+        if obj is not None and len(shard_aliases()) > 1:
+            return (*super().get_readonly_fields(request, obj), 'name')
+        return super().get_readonly_fields(request, obj)
     
     def get_books_count(self, obj):
         return obj.books.count()
     get_books_count.short_description = 'Number of Books'
 
 
-class LibrarianAdmin(admin.ModelAdmin):
+class LibrarianAdmin(ShardedModelAdmin):
     list_display = ('name', 'get_library_name')
+    list_select_related = ('library',)
     
     def get_library_name(self, obj):
-        return obj.Library.name if obj.Library else 'No Library'
+        return obj.library.name if obj.library else 'No Library'
     get_library_name.short_description = 'Library'
 
 class UserProfileAdmin(admin.ModelAdmin):
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RelationshipAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'relationship_app'
+
+    def ready(self):
+        from . import changelog, sharding  # noqa: F401  (connect the change log and catalog copy signals)
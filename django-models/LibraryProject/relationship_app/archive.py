@@ -0,0 +1,98 @@
+"""
+Archiving and chunked purging of authors and libraries.
+
+Deleting a prolific Author or a large Library cascades to every book,
+membership row and librarian in one transaction. Archiving instead is a
+handful of UPDATEs: the rows get ``archived_at`` set and disappear from
+the default managers (and so from views, queries and the admin).
+
+purge_archived() later hard-deletes archived rows in batches of
+``batch_size``. Each batch runs in its own short transaction, so other
+writers get a turn between batches.
+
+With libraries sharded (see sharding.py), libraries are archived on the
+shard their queryset reads from. Archived authors and books are also
+marked on every shard's copy of the catalog, and purging visits every
+database.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .changelog import log_archived
+from .models import Author, Book, Librarian, Library
+from .sharding import all_aliases, update_replicas
+
+
+def archive_authors(authors):
+    """Archive the given authors and all of their books."""
+    author_ids = list(authors.values_list('pk', flat=True))
+    now = timezone.now()
+    with transaction.atomic():
+        book_ids = list(Book.objects.filter(author_id__in=author_ids).values_list('pk', flat=True))
+        Book.objects.filter(pk__in=book_ids).update(archived_at=now)
+        Author.objects.filter(pk__in=author_ids).update(archived_at=now)
+        log_archived(Book, book_ids)
+        log_archived(Author, author_ids)
+    update_replicas(Book, book_ids, archived_at=now)
+    update_replicas(Author, author_ids, archived_at=now)
+    return len(author_ids)
+
+
+def archive_libraries(libraries):
+    """Archive the given libraries and their librarians. Books are kept."""
+    using = libraries.db
+    library_ids = list(libraries.values_list('pk', flat=True))
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        librarian_ids = list(
+            Librarian.objects.using(using).filter(library_id__in=library_ids).values_list('pk', flat=True)
+        )
+        Librarian.objects.using(using).filter(pk__in=librarian_ids).update(archived_at=now)
+        Library.objects.using(using).filter(pk__in=library_ids).update(archived_at=now)
+        log_archived(Librarian, librarian_ids, using)
+        log_archived(Library, library_ids, using)
+    return len(library_ids)
+
+
+def delete_in_batches(queryset, batch_size):
+    """Delete ``queryset`` ``batch_size`` rows at a time. Yields rows deleted per batch."""
+    model = queryset.model
+    using = queryset.db
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            model._base_manager.using(using).filter(pk__in=ids).delete()
+        yield len(ids)
+
+
+def purge_archived(batch_size=500, archived_before=None):
+    """
+    Hard-delete archived rows, leaves first so no single delete cascades far.
+
+    Yields (label, rows) after every batch; labels name the shard when it
+    is not 'default'.
+    """
+    archived = {'archived_at__isnull': False}
+    if archived_before is not None:
+        archived['archived_at__lt'] = archived_before
+    Membership = Library.books.through
+
+    for using in all_aliases():
+        library_ids = Library.all_objects.using(using).filter(**archived).values('pk')
+        author_ids = Author.all_objects.using(using).filter(**archived).values('pk')
+        steps = [
+            ('librarians', Librarian.all_objects.using(using).filter(**archived)),
+            ('library memberships', Membership.objects.using(using).filter(library_id__in=library_ids)),
+            ('librarians of archived libraries', Librarian.all_objects.using(using).filter(library_id__in=library_ids)),
+            ('libraries', Library.all_objects.using(using).filter(**archived)),
+            ('books', Book.all_objects.using(using).filter(**archived)),
+            ('books of archived authors', Book.all_objects.using(using).filter(author_id__in=author_ids)),
+            ('authors', Author.all_objects.using(using).filter(**archived)),
+        ]
+        suffix = '' if using == 'default' else f' ({using})'
+        for label, queryset in steps:
+            for rows in delete_in_batches(queryset, batch_size):
+                yield label + suffix, rows
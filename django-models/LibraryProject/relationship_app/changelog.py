@@ -0,0 +1,100 @@
+"""
+Transactional outbox for the catalog.
+
+Every create/update/delete of Author, Book, Library and Librarian, and every
+book added to or removed from a library, appends a ChangeLogEntry. The
+entry is written by a signal handler on the same connection and inside the
+same transaction as the change (ChangeLoggedModel.save and Django's delete
+and m2m helpers are all atomic), so a change and its log entry commit or
+roll back together.
+
+Queryset.update() and bulk_create() send no signals and are not logged;
+archive.py logs its bulk updates itself through log_archived(). Writes
+that only keep a shard's copy of the catalog in sync (see sharding.py)
+are not logged either; the change was logged on 'default'.
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Author, Book, ChangeLogEntry, Librarian, Library
+from .sharding import is_replica_write
+
+LOGGED_MODELS = (Author, Book, Library, Librarian)
+
+MEMBERSHIP = 'library_books'
+
+
+def serialize(instance):
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+
+def log_instance(sender, instance, action, using):
+    ChangeLogEntry.objects.using(using).create(
+        model=sender._meta.model_name,
+        object_id=str(instance.pk),
+        action=action,
+        data=serialize(instance) if action != 'delete' else {'id': instance.pk},
+    )
+
+
+def log_membership(pairs, action, using):
+    ChangeLogEntry.objects.using(using).bulk_create([
+        ChangeLogEntry(
+            model=MEMBERSHIP,
+            object_id=f'{library_id}:{book_id}',
+            action=action,
+            data={'library_id': library_id, 'book_id': book_id},
+        )
+        for library_id, book_id in sorted(pairs)
+    ])
+
+
+def log_archived(sender, pks, using='default'):
+    """Log archived rows as deletes; they are already gone from the feed's point of view."""
+    ChangeLogEntry.objects.using(using).bulk_create([
+        ChangeLogEntry(model=sender._meta.model_name, object_id=str(pk), action='delete', data={'id': pk})
+        for pk in pks
+    ])
+
+
+def log_save(sender, instance, created, raw=False, using=None, **kwargs):
+    if not raw and not is_replica_write(sender, using):
+        log_instance(sender, instance, 'create' if created else 'update', using)
+
+
+def log_delete(sender, instance, using=None, **kwargs):
+    # Archived rows were logged as deleted when they were archived.
+    if getattr(instance, 'archived_at', None) is None and not is_replica_write(sender, using):
+        log_instance(sender, instance, 'delete', using)
+
+
+# Connected per model so unrelated models keep Django's fast-path deletes.
+for model in LOGGED_MODELS:
+    post_save.connect(log_save, sender=model, dispatch_uid=f'changelog_save_{model._meta.model_name}')
+    post_delete.connect(log_delete, sender=model, dispatch_uid=f'changelog_delete_{model._meta.model_name}')
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def log_library_books(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    """
+    Log one add/remove entry per (library, book) pair, whichever side
+    of the relation was changed.
+    """
+    if action == 'pre_clear':
+        # pk_set is not provided for clears; remember what is about to go.
+        field = 'library_id' if reverse else 'book_id'
+        owner = 'book_id' if reverse else 'library_id'
+        instance._cleared_pks = set(
+            sender.objects.using(using).filter(**{owner: instance.pk}).values_list(field, flat=True)
+        )
+        return
+    if action == 'post_clear':
+        pk_set, action = getattr(instance, '_cleared_pks', set()), 'post_remove'
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    if reverse:
+        pairs = {(library_id, instance.pk) for library_id in pk_set}
+    else:
+        pairs = {(instance.pk, book_id) for book_id in pk_set}
+    log_membership(pairs, 'add' if action == 'post_add' else 'remove', using)
@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from relationship_app import views
+from relationship_app.models import UserProfile
+
+
+DASHBOARDS = {
+    'admin_view': ('Admin', views.admin_view),
+    'librarian_view': ('Librarian', views.librarian_view),
+    'member_view': ('Member', views.member_view),
+    'list_books': (None, views.list_books),
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure render time and response size of the dashboard pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Renders per page (default: 200)')
+        parser.add_argument('pages', nargs='*', help=f'Pages to benchmark: {", ".join(DASHBOARDS)} (default: all)')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        pages = options['pages'] or list(DASHBOARDS)
+        unknown = set(pages) - set(DASHBOARDS)
+        if unknown:
+            raise CommandError(f'Unknown page(s): {", ".join(sorted(unknown))}')
+        factory = RequestFactory()
+
+        self.stdout.write(f'{"page":<16}{"ms/render":>12}{"bytes":>10}')
+        for name in pages:
+            role, view = DASHBOARDS[name]
+            request = factory.get('/')
+            request.user = self.make_user(role)
+            request.session = SessionBase()
+            request._messages = FallbackStorage(request)
+
+            body = b''.join(view(request))  # warm up template loaders
+            start = time.perf_counter()
+            for _ in range(iterations):
+                # Joining the response also drains streaming pages.
+                body = b''.join(view(request))
+            elapsed = (time.perf_counter() - start) / iterations
+
+            self.stdout.write(f'{name:<16}{elapsed * 1000:>12.3f}{len(body):>10}')
+
+    def make_user(self, role):
+        """Build an unsaved user whose profile satisfies the role checks."""
+        user = User(username='bench')
+        if role:
+            user.profile = UserProfile(user=user, role=role)
+        return user
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.urls.resolvers import RoutePattern
+
+# Sample values for path converters when building a URL to resolve.
+SAMPLE_VALUES = {'int': '1', 'str': 'Sample', 'slug': 'sample', 'path': 'sample'}
+
+
+def iter_routes(patterns, prefix=''):
+    """
+    Yield (route, pattern) for every URLPattern, with include() prefixes
+    applied. Patterns under a regex (re_path) are skipped.
+    """
+    for pattern in patterns:
+        if not isinstance(pattern.pattern, RoutePattern):
+            continue
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern
+
+
+def sample_path(route):
+    """Fill a route's converters with sample values: 'edit/<int:id>/' -> '/edit/1/'."""
+    parts = []
+    for i, part in enumerate(route.replace('>', '<').split('<')):
+        if i % 2:
+            converter = part.split(':')[0] if ':' in part else 'str'
+            part = SAMPLE_VALUES.get(converter, 'sample')
+        parts.append(part)
+    return '/' + ''.join(parts)
+
+
+class Command(BaseCommand):
+    help = 'Measure URL resolution time for every route in the URLconf'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10000, help='Resolves per route (default: 10000)')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        routes = [(route, sample_path(route)) for route, pattern in iter_routes(get_resolver().url_patterns)]
+
+        self.stdout.write(f'{"path":<48}{"us/resolve":>12}  view')
+        total = 0.0
+        for route, path in routes:
+            match = resolve(path)  # warm up the resolver's caches
+            start = time.perf_counter()
+            for _ in range(iterations):
+                resolve(path)
+            elapsed = (time.perf_counter() - start) / iterations
+            total += elapsed
+            self.stdout.write(f'{path:<48}{elapsed * 1e6:>12.2f}  {match.view_name}')
+        self.stdout.write(f'{len(routes)} routes, {total / len(routes) * 1e6:.2f} us/resolve on average')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from relationship_app.recommendations import build_similar_books
+
+
+class Command(BaseCommand):
+    help = 'Recompute the top-K similar books for every title (needs numpy and scipy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10, help='Similar books kept per title (default: 10)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        try:
+            count = build_similar_books(k=options['top_k'], batch_size=options['batch_size'])
+        except ImportError as exc:
+            raise CommandError(f'build_recommendations needs numpy and scipy installed ({exc})') from exc
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} similar-book entries'))
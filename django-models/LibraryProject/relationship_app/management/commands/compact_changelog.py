@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from relationship_app.models import ChangeLogEntry
+from relationship_app.sharding import all_aliases
+
+
+class Command(BaseCommand):
+    help = 'Delete change log entries superseded by a newer entry for the same object'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=7,
+            help='Only compact entries older than this, so active consumers still see every step (default: 7)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement (default: 1000)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        # Each shard keeps its own log of the libraries it holds.
+        deleted = sum(self.compact(alias, cutoff, options['batch_size']) for alias in all_aliases())
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} superseded change log entries'))
+
+    def compact(self, alias, cutoff, batch_size):
+        entries = ChangeLogEntry.objects.using(alias)
+        newer = entries.filter(
+            model=OuterRef('model'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'),
+        )
+        superseded = (
+            entries.filter(created_at__lt=cutoff)
+            .filter(Exists(newer))
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+        # A consumer replaying from any cursor still ends on each object's
+        # latest state; only intermediate states are dropped.
+        deleted = 0
+        while True:
+            ids = list(superseded[:batch_size])
+            if not ids:
+                break
+            deleted += entries.filter(id__in=ids).delete()[0]
+        return deleted
@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# -X importtime only reports imports made by import statements; Django
+# loads settings, apps, URLconfs and middleware through
+# importlib.import_module, which would hide them. Route it through
+# __import__ before Django binds it.
+PRELUDE = """
+import importlib, importlib.util, sys
+def import_module(name, package=None):
+    if name.startswith('.'):
+        name = importlib.util.resolve_name(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = import_module
+"""
+
+# What a fresh process imports for each stage of startup.
+STAGES = {
+    'setup': 'import django; django.setup()',
+    'wsgi': (
+        'from django.core.wsgi import get_wsgi_application; get_wsgi_application(); '
+        'from django.urls import get_resolver; get_resolver().url_patterns'
+    ),
+    'preload': (
+        'from django.core.wsgi import get_wsgi_application; get_wsgi_application(); '
+        'from LibraryProject.preload import preload; preload()'
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``python -X importtime`` output into a list of
+    (module, self_us, cumulative_us, depth), in import order.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            own, cumulative, name = line[len('import time:'):].split('|')
+            own, cumulative = int(own), int(cumulative)
+        except ValueError:
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), own, cumulative, depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Report per-module import cost of starting LibraryProject in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stage', choices=list(STAGES), default='wsgi',
+            help='setup: django.setup(); wsgi: a worker ready for its first request (default); '
+                 'preload: wsgi plus the pre-fork warm-up',
+        )
+        parser.add_argument('--limit', type=int, default=25, help='Rows to show (default: 25)')
+        parser.add_argument('--prefix', help='Only show modules starting with this, e.g. relationship_app')
+        parser.add_argument(
+            '--by-package', action='store_true',
+            help='Sum self time per top-level package instead of listing modules',
+        )
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PRELUDE + STAGES[options['stage']]],
+            env=env, capture_output=True, text=True,
+        )
+        elapsed = time.perf_counter() - start
+        if result.returncode:
+            raise CommandError(f'Startup failed:\n{result.stderr[-2000:]}')
+
+        modules = parse_importtime(result.stderr)
+        if options['prefix']:
+            modules = [m for m in modules if m[0].startswith(options['prefix'])]
+
+        if options['by_package']:
+            totals = {}
+            for name, own, _, _ in modules:
+                package = name.split('.')[0]
+                totals[package] = totals.get(package, 0) + own
+            rows = sorted(totals.items(), key=lambda item: -item[1])[:options['limit']]
+            self.stdout.write(f'{"self ms":>10}  package')
+            for package, own in rows:
+                self.stdout.write(f'{own / 1000:>10.2f}  {package}')
+        else:
+            rows = sorted(modules, key=lambda m: -m[2])[:options['limit']]
+            self.stdout.write(f'{"self ms":>10}{"cumul ms":>10}  module')
+            for name, own, cumulative, _ in rows:
+                self.stdout.write(f'{own / 1000:>10.2f}{cumulative / 1000:>10.2f}  {name}')
+
+        imported = sum(own for _, own, _, _ in modules) / 1000
+        self.stdout.write(
+            f'{len(modules)} modules, {imported:.1f} ms importing; '
+            f'{elapsed * 1000:.0f} ms wall clock for the whole process'
+        )
+        if os.environ.get('PYTHONDONTWRITEBYTECODE'):
+            self.stdout.write(self.style.WARNING(
+                'PYTHONDONTWRITEBYTECODE is set, so project modules are compiled from source on every '
+                'start. Run `python -m compileall .` when building the image to cache their bytecode.'
+            ))
@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from relationship_app.archive import purge_archived
+
+
+class Command(BaseCommand):
+    help = 'Hard-delete archived authors, books, libraries and librarians in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per transaction (default: 500)')
+        parser.add_argument('--older-than-days', type=int, default=0, help='Only purge rows archived at least this long ago')
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Seconds to sleep between batches, to leave room for other writers',
+        )
+
+    def handle(self, *args, **options):
+        archived_before = timezone.now() - timedelta(days=options['older_than_days'])
+        totals = {}
+        for label, rows in purge_archived(options['batch_size'], archived_before):
+            totals[label] = totals.get(label, 0) + rows
+            if options['pause']:
+                time.sleep(options['pause'])
+        for label, rows in totals.items():
+            self.stdout.write(f'Purged {rows} {label}')
+        self.stdout.write(self.style.SUCCESS(f'Purged {sum(totals.values())} rows'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from relationship_app.queries import books_by_authors, books_in_libraries, librarians_for_libraries
+
+
+class Command(BaseCommand):
+    help = 'List books by author, books in a library and the librarian of a library'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', action='append', default=[], help='Author name (repeatable)')
+        parser.add_argument('--library', action='append', default=[], help='Library name (repeatable)')
+
+    def handle(self, *args, **options):
+        authors = options['author']
+        libraries = options['library']
+        if not authors and not libraries:
+            raise CommandError('Give at least one --author or --library')
+
+        for author, books in books_by_authors(authors).items():
+            self.stdout.write(f'=== Books by {author} ===')
+            self.write_books(books)
+
+        if libraries:
+            librarians = librarians_for_libraries(libraries)
+            for library, books in books_in_libraries(libraries).items():
+                librarian = librarians[library]
+                self.stdout.write(f'=== {library} (librarian: {librarian.name if librarian else "none"}) ===')
+                self.write_books(books)
+
+    def write_books(self, books):
+        for book in books:
+            self.stdout.write(f'  {book.title} by {book.author.name}')
+        if not books:
+            self.stdout.write('  (no books)')
@@ -0,0 +1,64 @@
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from relationship_app.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Create users and their UserProfiles in bulk for load tests and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of users to create')
+        parser.add_argument('--prefix', default='user', help='Username prefix (default: user)')
+        parser.add_argument('--password', default='password', help='Password shared by every seeded user')
+        parser.add_argument(
+            '--role',
+            default='Member',
+            choices=[choice for choice, _ in UserProfile.ROLE_CHOICES],
+            help='Role given to every seeded profile',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per INSERT (default: 500)')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        prefix = options['prefix']
+        batch_size = options['batch_size']
+        if count < 1:
+            raise CommandError('count must be a positive number')
+
+        # Continue after the highest existing <prefix><n>, so re-runs and
+        # hand-made users such as user1 never collide with the new names.
+        suffixes = (
+            username[len(prefix):]
+            for username in User.objects.filter(username__startswith=prefix).values_list('username', flat=True)
+        )
+        start = max((int(suffix) + 1 for suffix in suffixes if suffix.isdigit()), default=0)
+        usernames = [f'{prefix}{start + i}' for i in range(count)]
+
+        # Hash once and share it: every seeded user has the same password,
+        # so paying the hasher cost per user buys nothing.
+        password = make_password(options['password'])
+
+        with transaction.atomic():
+            # bulk_create skips post_save, so profiles are created here instead
+            # of by create_user_profile. Only the users created here get one,
+            # never users another writer adds at the same time.
+            users = User.objects.bulk_create(
+                [User(username=username, password=password) for username in usernames],
+                batch_size=batch_size,
+            )
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # No primary keys came back (e.g. SQLite before 3.35).
+                users = [
+                    user
+                    for i in range(0, count, batch_size)
+                    for user in User.objects.filter(username__in=usernames[i:i + batch_size])
+                ]
+            UserProfile.objects.bulk_create(
+                [UserProfile(user=user, role=options['role']) for user in users],
+                batch_size=batch_size,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Created {count} users with {options["role"]} profiles'))
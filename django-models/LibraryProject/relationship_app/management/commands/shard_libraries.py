@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from relationship_app.models import Library
+from relationship_app.sharding import all_aliases, move_library, replicate_catalog, shard_for
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the catalog to every shard, then move each library (with its '
+        'memberships and librarian) to the shard its name maps to'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Catalog rows per INSERT (default: 500)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report libraries that would move')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if not dry_run:
+            for alias, rows in replicate_catalog(batch_size=options['batch_size']).items():
+                self.stdout.write(f'Copied {rows} catalog rows to {alias}')
+
+        moved = 0
+        for alias in all_aliases():
+            for library in Library.all_objects.using(alias).order_by('pk'):
+                target = shard_for(library.name)
+                if target == alias:
+                    continue
+                if not dry_run:
+                    move_library(library, target)
+                self.stdout.write(f'{library.name}: {alias} -> {target}')
+                moved += 1
+        verb = 'would move' if dry_run else 'moved'
+        self.stdout.write(self.style.SUCCESS(f'{moved} libraries {verb}'))
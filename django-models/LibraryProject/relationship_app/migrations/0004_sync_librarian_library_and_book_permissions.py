@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationship_app', '0003_alter_userprofile_role_alter_userprofile_user'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='book',
+            options={'permissions': [('can_add_book', 'Can add book'), ('can_change_book', 'Can change book'), ('can_delete_book', 'Can delete book')]},
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='books', to='relationship_app.author'),
+        ),
+        migrations.RenameField(
+            model_name='librarian',
+            old_name='Library',
+            new_name='library',
+        ),
+        migrations.AlterField(
+            model_name='librarian',
+            name='library',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='librarian', to='relationship_app.library'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='role',
+            field=models.CharField(choices=[('Admin', 'Admin'), ('Librarian', 'Librarian'), ('Member', 'Member')], default='Member', max_length=20),
+        ),
+    ]
@@ -46,17 +46,67 @@
 
 
 
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-class Author(models.Model):
+class ChangeLoggedModel(models.Model):
+    """
+    Saves run in a transaction so the ChangeLogEntry written by the
+    post_save handler (see changelog.py) commits or rolls back with the row.
+    """
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+class ActiveManager(models.Manager):
+    """Default manager that hides archived rows."""
+    def get_queryset(self):
+        return super().get_queryset().filter(archived_at__isnull=True)
+
+class ShardedQuerySet(models.QuerySet):
+    """
+    create() lets save() ask the router with the new row in hand, so
+    libraries and librarians land on their shard (see sharding.py).
+    """
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True)
+        return obj
+
+class ArchivableModel(ChangeLoggedModel):
+    """
+    Rows are archived (hidden from ``objects``) instead of deleted, and later
+    purged in small batches by `manage.py purge_archived`; see archive.py.
+    ``all_objects`` still sees archived rows.
+    """
+    archived_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def is_archived(self):
+        return self.archived_at is not None
+
+class Author(ArchivableModel):
     name = models.CharField(max_length=30)
     def __str__(self):
         return self.name
 
-class Book(models.Model):
+class Book(ArchivableModel):
     title = models.CharField(max_length=30)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
     
@@ -70,18 +120,76 @@ class Book(models.Model):
     def __str__(self):
         return self.title
 
-class Library(models.Model):
+class Library(ArchivableModel):
     name = models.CharField(max_length=30)
     books = models.ManyToManyField(Book)
+
+    objects = ActiveManager.from_queryset(ShardedQuerySet)()
+    all_objects = models.Manager.from_queryset(ShardedQuerySet)()
+
     def __str__(self):
         return self.name
 
-class Librarian(models.Model):
+class SimilarBook(models.Model):
+    """
+    Precomputed "similar books" for a title, best match first.
+
+    Rebuilt by `manage.py build_recommendations`; see recommendations.py.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['book', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='unique_similar_book_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.book} -> {self.similar} ({self.score:.2f})"
+
+class Librarian(ArchivableModel):
     name = models.CharField(max_length=30)
     library = models.OneToOneField(Library, on_delete=models.CASCADE, related_name='librarian')
+
+    objects = ActiveManager.from_queryset(ShardedQuerySet)()
+    all_objects = models.Manager.from_queryset(ShardedQuerySet)()
+
     def __str__(self):
         return self.name
 
+class ChangeLogEntry(models.Model):
+    """
+    Append-only feed of catalog changes, read in id order by downstream
+    consumers (see views.change_feed). Library membership changes are
+    logged per (library, book) pair under model 'library_books'.
+    """
+    ACTION_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+        ('add', 'Add'),
+        ('remove', 'Remove'),
+    ]
+
+    model = models.CharField(max_length=30)
+    object_id = models.CharField(max_length=60)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    data = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Compaction looks for newer entries of the same object.
+            models.Index(fields=['model', 'object_id', 'id'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.model} {self.object_id}"
+
 class UserProfile(models.Model):
     ROLE_CHOICES = [
         ('Admin', 'Admin'),
@@ -0,0 +1,80 @@
+"""
+Relationship queries for authors, libraries and librarians.
+
+Each lookup runs exactly one query. The batched variants take many names
+and still run one query in total, returning a dict keyed by the names
+asked for (names with no match map to an empty list or None).
+
+Library lookups go to the library's shard (see sharding.py); with
+several shards the batched variants run one query per shard involved.
+Filtering books by library name bypasses Library's ActiveManager, so
+archived libraries are excluded explicitly.
+"""
+
+from django.db.models import F
+
+from .models import Book, Librarian
+from .sharding import shard_for
+
+
+def by_shard(library_names):
+    """Group library names by the shard holding them."""
+    groups = {}
+    for name in library_names:
+        groups.setdefault(shard_for(name), []).append(name)
+    return groups
+
+
+def books_by_author(author_name):
+    """All books written by the author called ``author_name``."""
+    return Book.objects.filter(author__name=author_name).select_related('author')
+
+
+def books_in_library(library_name):
+    """All books held by the library called ``library_name``."""
+    return (
+        Book.objects.using(shard_for(library_name))
+        .filter(library__name=library_name, library__archived_at__isnull=True)
+        .select_related('author')
+    )
+
+
+def librarian_for_library(library_name):
+    """The librarian of the library called ``library_name``, or None."""
+    return (
+        Librarian.objects.using(shard_for(library_name))
+        .select_related('library').filter(library__name=library_name).first()
+    )
+
+
+def books_by_authors(author_names):
+    """Map each author name to the list of their books."""
+    result = {name: [] for name in author_names}
+    books = Book.objects.filter(author__name__in=result).select_related('author').order_by('author__name', 'title')
+    for book in books:
+        result[book.author.name].append(book)
+    return result
+
+
+def books_in_libraries(library_names):
+    """Map each library name to the list of books it holds."""
+    result = {name: [] for name in library_names}
+    for shard, names in by_shard(result).items():
+        books = (
+            Book.objects.using(shard).filter(library__name__in=names, library__archived_at__isnull=True)
+            .select_related('author')
+            .annotate(library_name=F('library__name'))
+            .order_by('library__name', 'title')
+        )
+        for book in books:
+            result[book.library_name].append(book)
+    return result
+
+
+def librarians_for_libraries(library_names):
+    """Map each library name to its librarian, or None."""
+    result = dict.fromkeys(library_names)
+    for shard, names in by_shard(result).items():
+        for librarian in Librarian.objects.using(shard).filter(library__name__in=names).select_related('library'):
+            result[librarian.library.name] = librarian
+    return result
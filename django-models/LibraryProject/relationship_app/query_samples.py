@@ -2,28 +2,25 @@
 # Query all books by a specific author.
 # List all books in a library.
 # Retrieve the librarian for a library.
+#
+# The queries themselves live in relationship_app.queries; run them with
+#   python manage.py relationship_queries --author NAME --library NAME
 
-from .models import Book, Author, Librarian, Library
+from .queries import books_by_author, books_in_library, librarian_for_library
 
-# Query all books by a specific author.
-print("=== Query all books by a specific author ===")
-author =  Author.objects.get(name=author_name)
-books_by_author = Book.objects.filter(author=author)
-for book in books_by_author:
-    print(f"Book: {book.title}")
-
-print("\n=== List all books in a library ===")
-# List all books in a library.
-library_instance = Library.objects.get(name=library_name)
-books_in_library = library_instance.books.all()
 
-for book in books_in_library:
-    print(f"Book in library: {book.title}")
-
-print("\n=== Retrieve the librarian for a library ===")
-# Retrieve the librarian for a library.
-library_for_librarian = Library.objects.get(name=library_name)
-librarian_for_library = Librarian.objects.get(library=library_for_librarian)  # Using related_name to get the librarian object
-print(f"Librarian for {library_for_librarian.name}: {librarian_for_library.name}")
+def run_samples(author_name, library_name):
+    # Query all books by a specific author.
+    print("=== Query all books by a specific author ===")
+    for book in books_by_author(author_name):
+        print(f"Book: {book.title}")
 
+    # List all books in a library.
+    print("\n=== List all books in a library ===")
+    for book in books_in_library(library_name):
+        print(f"Book in library: {book.title}")
 
+    # Retrieve the librarian for a library.
+    print("\n=== Retrieve the librarian for a library ===")
+    librarian = librarian_for_library(library_name)
+    print(f"Librarian for {library_name}: {librarian.name if librarian else 'None'}")
@@ -0,0 +1,138 @@
+"""
+Sliding-window rate limiting for the expensive relationship_app views.
+
+Counters live in the cache named by RATELIMIT['CACHE']. The default,
+locmem, counts per process. For several workers use a shared cache whose
+incr() is atomic (memcached or Redis). FileBasedCache is shared too, but
+its incr() is a get followed by a set, so concurrent hits can be lost and
+the limits are only approximate. Each key keeps one counter per fixed window; the effective count
+weights the previous window by how much of it still overlaps the sliding
+window, which smooths out bursts at window boundaries for two cache hits.
+
+Checks run before the wrapped view, so rejected requests never reach the
+password hasher or the ORM.
+"""
+
+import hashlib
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from LibraryProject.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    # request.META key holding the client address. Set to
+    # 'HTTP_X_FORWARDED_FOR' only behind a proxy that overwrites it.
+    'IP_META_KEY': 'REMOTE_ADDR',
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RATELIMIT', {})}
+
+
+def parse_rate(rate):
+    """Turn '5/m' or '100/15m' into (limit, period_in_seconds)."""
+    limit, period = rate.split('/')
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(limit), multiplier * PERIODS[period[-1]]
+
+
+def client_ip(request):
+    value = request.META.get(get_config()['IP_META_KEY'], '')
+    return value.split(',')[0].strip() or 'unknown'
+
+
+def key_ip(request):
+    return client_ip(request)
+
+
+def key_user(request):
+    """Authenticated user id, falling back to the client address."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return client_ip(request)
+
+
+def key_username(request):
+    """The username being tried, so one account can't be hammered from many IPs."""
+    return request.POST.get('username', '').strip().lower() or None
+
+
+KEY_FUNCTIONS = {
+    'ip': key_ip,
+    'user': key_user,
+    'username': key_username,
+}
+
+
+def hit(cache, key, limit, period, now=None):
+    """
+    Record one request for ``key`` and return (allowed, retry_after).
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    current_key = f'{key}:{window}'
+
+    cache.add(current_key, 0, timeout=period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(current_key, 1, timeout=period * 2)
+        current = 1
+    else:
+        # Backends without a native incr() re-set the key with the default
+        # timeout (300s), which would end long windows early.
+        cache.touch(current_key, timeout=period * 2)
+    previous = cache.get(f'{key}:{window - 1}', 0)
+
+    elapsed = (now % period) / period
+    count = previous * (1 - elapsed) + current
+    if count <= limit:
+        return True, 0
+    return False, max(1, int(period - now % period))
+
+
+def ratelimit(scope, rate, key='ip', methods=('POST',)):
+    """
+    Reject requests over ``rate`` with 429 Too Many Requests.
+
+    ``key`` is one of 'ip', 'user' or 'username'. Requests whose key
+    resolves to nothing (e.g. no username posted) are not counted.
+    """
+    limit, period = parse_rate(rate)
+    key_function = KEY_FUNCTIONS[key]
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            config = get_config()
+            if config['ENABLED'] and request.method in methods:
+                value = key_function(request)
+                if value is not None:
+                    cache = caches[config['CACHE']]
+                    # Hashed so arbitrary usernames make valid cache keys.
+                    digest = hashlib.sha1(value.encode()).hexdigest()
+                    allowed, retry_after = hit(cache, f'rl:{scope}:{key}:{digest}', limit, period)
+                    if not allowed:
+                        # Counted in the metrics registry, which is merged across workers.
+                        registry.inc('library_ratelimit_rejections_total', {'scope': scope})
+                        logger.warning('Rate limit exceeded for %s (per %s)', scope, key)
+                        response = HttpResponse('Too many requests. Please try again later.', status=429)
+                        response.headers['Retry-After'] = str(retry_after)
+                        return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
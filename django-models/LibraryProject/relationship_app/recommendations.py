@@ -0,0 +1,118 @@
+"""
+Item-item "similar books" recommendations.
+
+Books are similar when the same baskets hold them. A basket is currently a
+library's holdings; further sources (such as a member's loan history) only
+need to be added to BASKET_SOURCES as functions yielding
+(basket_key, book_id) pairs.
+
+The build step turns the baskets into a sparse baskets x books matrix M,
+computes the co-occurrence matrix C = M.T @ M, normalises it to cosine
+similarity and keeps the top K neighbours of every book in SimilarBook.
+NumPy and SciPy are only imported by the build step, so web workers never
+load them; serving is a single indexed query on SimilarBook.
+"""
+
+from django.db import transaction
+
+from .models import Library, SimilarBook
+from .sharding import shard_aliases
+
+
+def library_holdings():
+    """Each library's books form one basket, read from every shard. Archived rows are left out."""
+    for shard in shard_aliases():
+        through = (
+            Library.books.through.objects.using(shard)
+            .filter(library__archived_at__isnull=True, book__archived_at__isnull=True)
+            .values_list('library_id', 'book_id')
+        )
+        for library_id, book_id in through.iterator(chunk_size=5000):
+            # Library keys are only unique within a shard.
+            yield ('library', shard, library_id), book_id
+
+
+BASKET_SOURCES = [library_holdings]
+
+
+def top_k_similar(pairs, k):
+    """
+    Return {book_id: [(similar_book_id, score), ...]} with at most ``k``
+    neighbours per book, best first, from (basket_key, book_id) pairs.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    basket_index = {}
+    book_ids = []
+    book_index = {}
+    rows, cols = [], []
+    for basket, book_id in pairs:
+        rows.append(basket_index.setdefault(basket, len(basket_index)))
+        if book_id not in book_index:
+            book_index[book_id] = len(book_ids)
+            book_ids.append(book_id)
+        cols.append(book_index[book_id])
+    if not book_ids:
+        return {}
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(basket_index), len(book_ids)),
+    )
+    matrix.data[:] = 1  # duplicate pairs count once
+    cooccurrence = (matrix.T @ matrix).tocsr()
+
+    # Cosine similarity: C[i, j] / sqrt(n_i * n_j), n_i = baskets holding i.
+    norms = np.sqrt(cooccurrence.diagonal())
+    norms[norms == 0] = 1
+    scale = sparse.diags(1 / norms)
+    similarity = (scale @ cooccurrence @ scale).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    ids = np.asarray(book_ids)
+    result = {}
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if start == end:
+            continue
+        scores = similarity.data[start:end]
+        columns = similarity.indices[start:end]
+        if len(scores) > k:
+            best = np.argpartition(-scores, k)[:k]
+            scores, columns = scores[best], columns[best]
+        # Highest score first, ties broken by book id for stable output.
+        order = np.lexsort((ids[columns], -scores))
+        result[int(ids[row])] = [(int(ids[columns[i]]), float(scores[i])) for i in order]
+    return result
+
+
+def build_similar_books(k=10, batch_size=1000):
+    """Recompute SimilarBook from every basket source. Returns rows written."""
+    pairs = (pair for source in BASKET_SOURCES for pair in source())
+    neighbours = top_k_similar(pairs, k)
+    rows = [
+        SimilarBook(book_id=book_id, similar_id=similar_id, rank=rank, score=score)
+        for book_id, similar in neighbours.items()
+        for rank, (similar_id, score) in enumerate(similar)
+    ]
+    with transaction.atomic():
+        SimilarBook.objects.all().delete()
+        SimilarBook.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def similar_books_for(books, per_book=3):
+    """
+    Map each of ``books`` to its top ``per_book`` similar books, in one query.
+    Books archived since the last build are skipped.
+    """
+    result = {book.pk: [] for book in books}
+    entries = (
+        SimilarBook.objects.filter(book_id__in=result, rank__lt=per_book, similar__archived_at__isnull=True)
+        .select_related('similar__author')
+    )
+    for entry in entries:
+        result[entry.book_id].append(entry.similar)
+    return result
@@ -0,0 +1,249 @@
+"""
+Sharding of libraries across database aliases.
+
+Every Library is a tenant. The library row, its book memberships (the
+Library.books through table) and its Librarian live together on one
+shard, chosen from LIBRARY_SHARDS by hashing the library's name, the
+tenant key. The catalog (Author and Book) is written to 'default' and
+copied to every shard after each commit. That lets memberships reference
+books, and lets a library's own shard answer everything about it. Books
+added to a library before their copy has arrived (created earlier in the
+same transaction) are copied to that shard on the spot.
+
+    DATABASES = {'default': {...}, 'shard_0': {...}, 'shard_1': {...}}
+    DATABASE_ROUTERS = ['relationship_app.sharding.ShardRouter']
+    LIBRARY_SHARDS = ['shard_0', 'shard_1']
+
+With the default LIBRARY_SHARDS = ['default'], everything stays in one
+database and the router changes nothing.
+
+A saved library cannot be renamed onto another shard: save() raises
+ValueError. Create a new library instead, or rename it and then move it
+with move_library().
+
+Queries on sharded models need to know their shard. Use
+``.using(shard_for(name))``, or start from an instance loaded from a shard,
+because related lookups follow it. To ask every shard, use fan_out().
+Queries with no shard go to 'default'.
+
+Catalog copies follow save() and delete(). Queryset.update() and
+bulk_create() send no signals: archive.py updates the copies itself, and
+`manage.py shard_libraries` repairs anything else that was missed.
+"""
+
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from .models import Author, Book, Librarian, Library
+
+CATALOG_MODELS = (Author, Book)
+SHARDED_MODELS = (Library, Librarian, Library.books.through)
+
+
+def shard_aliases():
+    """Database aliases libraries are spread over."""
+    return list(getattr(settings, 'LIBRARY_SHARDS', [DEFAULT_DB_ALIAS]))
+
+
+def replica_aliases():
+    """Shards that hold a copy of the catalog."""
+    return [alias for alias in shard_aliases() if alias != DEFAULT_DB_ALIAS]
+
+
+def all_aliases():
+    """'default' followed by every other shard."""
+    return [DEFAULT_DB_ALIAS] + replica_aliases()
+
+
+def shard_for(tenant_key):
+    """The shard holding the library called ``tenant_key``."""
+    aliases = shard_aliases()
+    return aliases[zlib.crc32(tenant_key.encode()) % len(aliases)]
+
+
+def is_replica_write(model, using):
+    """True for writes that only keep a shard's catalog copy in sync."""
+    return issubclass(model, CATALOG_MODELS) and using != DEFAULT_DB_ALIAS
+
+
+def fan_out(query, aliases=None):
+    """
+    Run ``query(alias)`` on every shard and return {alias: result}.
+
+    Shards are asked one after another. Local SQLite shards gain nothing
+    from threads, because each thread would need its own connections.
+    """
+    return {alias: query(alias) for alias in aliases or shard_aliases()}
+
+
+def catalog_counts():
+    """Rows per catalog model; libraries and librarians are summed over every shard."""
+    counts = {model._meta.model_name: model.objects.count() for model in CATALOG_MODELS}
+    for model in (Library, Librarian):
+        per_shard = fan_out(lambda alias: model.objects.using(alias).count())
+        counts[model._meta.model_name] = sum(per_shard.values())
+    return counts
+
+
+class ShardRouter:
+    """
+    Send each library, its memberships and its librarian to their shard.
+    Catalog writes go to 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self.shard_for_instance(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        if issubclass(model, CATALOG_MODELS):
+            return DEFAULT_DB_ALIAS
+        return self.shard_for_instance(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every shard has a copy of the catalog.
+        if isinstance(obj1, CATALOG_MODELS) or isinstance(obj2, CATALOG_MODELS):
+            return True
+        return None
+
+    def shard_for_instance(self, model, instance):
+        if not issubclass(model, SHARDED_MODELS) or instance is None:
+            return None
+        if instance._state.db:
+            return instance._state.db
+        if isinstance(instance, Library):
+            return shard_for(instance.name)
+        if isinstance(instance, Librarian):
+            library = Librarian.library.field.get_cached_value(instance, None)
+            if library is not None:
+                return self.shard_for_instance(Library, library)
+        return None
+
+
+def check_library_shard(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Refuse to save a renamed library whose new name maps to another shard.
+    Lookups by name would go to the new shard and never find it.
+    """
+    if raw or instance._state.adding or shard_for(instance.name) == using:
+        return
+    old_name = sender._base_manager.using(using).filter(pk=instance.pk).values_list('name', flat=True).first()
+    # Libraries already on the wrong shard (not yet moved by
+    # `manage.py shard_libraries`) can still be edited.
+    if old_name is not None and shard_for(old_name) == using:
+        raise ValueError(
+            f'Renaming library {old_name!r} to {instance.name!r} would move it from '
+            f'{using!r} to {shard_for(instance.name)!r}; create a new library or use move_library().'
+        )
+
+
+def copy_to_replicas(sender, instance, raw=False, using=None, **kwargs):
+    if raw or using != DEFAULT_DB_ALIAS or not replica_aliases():
+        return
+    values = {field.attname: field.value_from_object(instance) for field in sender._meta.concrete_fields}
+
+    def copy():
+        for alias in replica_aliases():
+            # A raw save updates or inserts by primary key and is ignored by the change log.
+            sender(**values).save_base(using=alias, raw=True)
+
+    transaction.on_commit(copy, using=DEFAULT_DB_ALIAS)
+
+
+def delete_from_replicas(sender, instance, using=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS or not replica_aliases():
+        return
+    pk = instance.pk
+
+    def delete():
+        for alias in replica_aliases():
+            sender._base_manager.using(alias).filter(pk=pk).delete()
+
+    transaction.on_commit(delete, using=DEFAULT_DB_ALIAS)
+
+
+def copy_books(alias, book_ids):
+    """Copy the given books, and their authors, from 'default' to ``alias`` now."""
+    books = list(Book._base_manager.using(DEFAULT_DB_ALIAS).filter(pk__in=book_ids))
+    author_ids = {book.author_id for book in books}
+    author_ids -= set(Author._base_manager.using(alias).filter(pk__in=author_ids).values_list('pk', flat=True))
+    for author in Author._base_manager.using(DEFAULT_DB_ALIAS).filter(pk__in=author_ids):
+        author.save_base(using=alias, raw=True)
+    for book in books:
+        book.save_base(using=alias, raw=True)
+
+
+def copy_missing_books(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    """
+    Before books join a library on a shard, copy any the shard lacks. A book
+    created earlier in the same transaction is otherwise only copied at
+    commit, after the membership insert has failed its foreign key. If that
+    transaction then rolls back, the copy is left behind until
+    `manage.py shard_libraries` removes it.
+    """
+    if action != 'pre_add' or using == DEFAULT_DB_ALIAS or not pk_set:
+        return
+    book_ids = {instance.pk} if reverse else set(pk_set)
+    book_ids -= set(Book._base_manager.using(using).filter(pk__in=book_ids).values_list('pk', flat=True))
+    if book_ids:
+        copy_books(using, book_ids)
+
+
+def update_replicas(model, pks, **values):
+    """Apply a bulk ``update(**values)`` made on 'default' to every catalog copy."""
+    for alias in replica_aliases():
+        model._base_manager.using(alias).filter(pk__in=pks).update(**values)
+
+
+def replicate_catalog(batch_size=500):
+    """Make every shard's catalog match 'default'. Returns rows written per shard."""
+    written = {}
+    for alias in replica_aliases():
+        written[alias] = 0
+        for model in CATALOG_MODELS:
+            rows = list(model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk'))
+            stray = set(model._base_manager.using(alias).values_list('pk', flat=True)) - {row.pk for row in rows}
+            model._base_manager.using(alias).filter(pk__in=stray).delete()
+            model._base_manager.using(alias).bulk_create(
+                rows,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['pk'],
+                update_fields=[field.name for field in model._meta.concrete_fields if not field.primary_key],
+            )
+            written[alias] += len(rows)
+    return written
+
+
+def move_library(library, target):
+    """
+    Recreate ``library`` with its memberships and librarian on ``target``,
+    then delete the original. The moved rows get new primary keys, since
+    keys are only unique within a shard. The catalog must already be on
+    ``target``.
+    """
+    source = library._state.db
+    Membership = Library.books.through
+    book_ids = list(
+        Membership.objects.using(source).filter(library_id=library.pk).values_list('book_id', flat=True)
+    )
+    librarian = Librarian.all_objects.using(source).filter(library_id=library.pk).first()
+
+    with transaction.atomic(using=target):
+        moved = Library(name=library.name, archived_at=library.archived_at)
+        moved.save(using=target)
+        moved.books.add(*book_ids)
+        if librarian is not None:
+            Librarian(name=librarian.name, library=moved, archived_at=librarian.archived_at).save(using=target)
+    with transaction.atomic(using=source):
+        library.delete()
+    return moved
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(copy_to_replicas, sender=model, dispatch_uid=f'sharding_save_{model._meta.model_name}')
+    post_delete.connect(delete_from_replicas, sender=model, dispatch_uid=f'sharding_delete_{model._meta.model_name}')
+pre_save.connect(check_library_shard, sender=Library, dispatch_uid='sharding_check_library_shard')
+m2m_changed.connect(copy_missing_books, sender=Library.books.through, dispatch_uid='sharding_copy_missing_books')
@@ -0,0 +1,36 @@
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+
+# Placeholder the page template prints where the streamed rows belong.
+ROWS_MARKER = mark_safe('<!-- rows -->')
+
+
+def stream_template(request, template_name, context, rows_template, rows, chunk_size=200):
+    """
+    Stream a page whose body is a long list of rows.
+
+    The page template is rendered once with ``{{ rows }}`` set to a marker and
+    split around it; the queryset is then read with ``iterator()`` and each
+    chunk rendered through ``rows_template``. The head of the page is sent
+    before the first row is fetched and the full result set is never held
+    in memory.
+    """
+    page = render_to_string(template_name, {**context, 'rows': ROWS_MARKER}, request)
+    head, tail = page.split(ROWS_MARKER, 1)
+    template = get_template(rows_template)
+
+    def content():
+        yield head
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield template.render({'rows': chunk})
+                chunk = []
+        if chunk:
+            yield template.render({'rows': chunk})
+        yield tail
+
+    return StreamingHttpResponse(content(), content_type='text/html; charset=utf-8')
@@ -1,3 +1,770 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.templatetags.static import static
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+from django.utils import timezone
+
+from LibraryProject import metrics
+from LibraryProject.compression import CompressionMiddleware
+from LibraryProject.preload import preload
+from LibraryProject.static import StaticFilesMiddleware
+
+from . import queries, urls, views
+from .management.commands.bench_urls import iter_routes, sample_path
+from .management.commands.importtime import parse_importtime
+from .archive import archive_authors, archive_libraries, purge_archived
+from .models import Author, Book, ChangeLogEntry, Librarian, Library, SimilarBook, UserProfile
+from .ratelimit import hit
+from .recommendations import build_similar_books, similar_books_for
+from .sharding import catalog_counts, shard_for
+
+
+class SeedUsersCommandTests(TestCase):
+    def test_creates_users_with_profiles(self):
+        call_command('seed_users', 25, role='Librarian', stdout=StringIO())
+        self.assertEqual(User.objects.count(), 25)
+        self.assertEqual(UserProfile.objects.filter(role='Librarian').count(), 25)
+
+    def test_seeded_users_can_log_in(self):
+        call_command('seed_users', 1, password='secret', stdout=StringIO())
+        self.assertTrue(self.client.login(username='user0', password='secret'))
+
+    def test_numbering_continues_after_existing_users(self):
+        User.objects.create_user('user1')
+        User.objects.create_user('username')
+        call_command('seed_users', 2, stdout=StringIO())
+        call_command('seed_users', 1, stdout=StringIO())
+        self.assertEqual(
+            sorted(User.objects.values_list('username', flat=True)),
+            ['user1', 'user2', 'user3', 'user4', 'username'],
+        )
+        self.assertEqual(UserProfile.objects.count(), 5)
+
+    def test_users_created_meanwhile_are_left_alone(self):
+        create = User.objects.bulk_create
+
+        def bulk_create_racing_another_writer(objs, **kwargs):
+            created = create(objs, **kwargs)
+            User.objects.create_user('signup')  # gets its profile from post_save
+            return created
+
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=bulk_create_racing_another_writer):
+            call_command('seed_users', 3, stdout=StringIO())
+        self.assertEqual(UserProfile.objects.count(), 4)
+        self.assertEqual(UserProfile.objects.get(user__username='signup').role, 'Member')
+
+
+class DashboardTemplateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('librarian', password='secret')
+        self.user.profile.role = 'Librarian'
+        self.user.profile.save()
+
+    def get(self, view):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return view(request)
+
+    def add_books(self, count):
+        author = Author.objects.create(name='Author')
+        library = Library.objects.create(name=f'Library {Library.objects.count()}')
+        books = Book.objects.bulk_create([Book(title=f'Book {i}', author=author) for i in range(count)])
+        library.books.set(books)
+
+    def count_queries(self, view):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(view)
+        return len(queries)
+
+    def test_uses_shared_stylesheet(self):
+        response = self.get(views.librarian_view)
+        self.assertContains(response, 'relationship_app/css/base.css')
+        self.assertNotContains(response, '<style>')
+
+    def test_query_count_does_not_grow_with_catalog(self):
+        self.add_books(1)
+        baseline = self.count_queries(views.librarian_view)
+        self.add_books(20)
+        self.assertEqual(self.count_queries(views.librarian_view), baseline)
+
+
+class StaticPipelineTests(SimpleTestCase):
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        static_settings = override_settings(
+            STATIC_ROOT=static_root.name,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'LibraryProject.static.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        static_settings.enable()
+        self.addCleanup(static_settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('app'))
+
+    def get(self, path, **headers):
+        return self.middleware(RequestFactory().get(path, headers=headers))
+
+    def test_hashed_file_is_cached_forever_and_compressed(self):
+        url = static('relationship_app/css/base.css')
+        self.assertNotEqual(url, '/static/relationship_app/css/base.css')
+        response = self.get(url, accept_encoding='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+    def test_unhashed_file_gets_short_cache(self):
+        response = self.get('/static/relationship_app/css/base.css')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('immutable', response.headers['Cache-Control'])
+
+    def test_conditional_request_and_passthrough(self):
+        url = static('relationship_app/css/styles.css')
+        etag = self.get(url).headers['ETag']
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+        self.assertEqual(self.get('/books/').content, b'app')
+
+    def test_refused_encoding_is_not_served(self):
+        url = static('relationship_app/css/base.css')
+        response = self.get(url, accept_encoding='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(b''.join(response.streaming_content), b''.join(self.get(url).streaming_content))
+
+    def test_each_encoding_has_its_own_etag(self):
+        url = static('relationship_app/css/base.css')
+        identity = self.get(url).headers['ETag']
+        gzipped = self.get(url, accept_encoding='gzip').headers['ETag']
+        self.assertNotEqual(identity, gzipped)
+        self.assertEqual(self.get(url, accept_encoding='gzip', if_none_match=gzipped).status_code, 304)
+        self.assertEqual(self.get(url, if_none_match=gzipped).status_code, 200)
+
+
+class ProductionSettingsTests(SimpleTestCase):
+    def test_static_files_are_served_after_security_middleware(self):
+        middleware = import_module('LibraryProject.settings_production').MIDDLEWARE
+        static = middleware.index('LibraryProject.static.StaticFilesMiddleware')
+        self.assertEqual(middleware[static - 1], 'django.middleware.security.SecurityMiddleware')
+        self.assertLess(middleware.index('LibraryProject.metrics.MetricsMiddleware'), static)
+
+
+class StreamingListTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author')
+        self.library = Library.objects.create(name='Central')
+        self.library.books.set(
+            Book.objects.bulk_create([Book(title=f'Book {i}', author=author) for i in range(450)])
+        )
+
+    def test_list_books_streams_every_row(self):
+        response = views.list_books(RequestFactory().get('/'))
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 3)
+        body = b''.join(chunks).decode()
+        self.assertEqual(body.count('<li>'), 450)
+        self.assertTrue(body.rstrip().endswith('</html>'))
+
+    def test_library_detail_streams_its_books(self):
+        view = views.LibraryDetailView.as_view()
+        response = view(RequestFactory().get('/'), title='Central')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('Library: Central', body)
+        self.assertEqual(body.count('<li>'), 450)
+
+
+@override_settings(RESPONSE_COMPRESSION={'ENCODINGS': ['gzip'], 'MIN_SIZE': 100})
+class CompressionMiddlewareTests(SimpleTestCase):
+    def get(self, response, accept_encoding='gzip'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(RequestFactory().get('/', headers={'accept-encoding': accept_encoding}))
+
+    def test_compresses_large_responses(self):
+        response = self.get(HttpResponse('x' * 1000))
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'x' * 1000)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_skips_small_responses_and_unsupported_clients(self):
+        self.assertNotIn('Content-Encoding', self.get(HttpResponse('x' * 50)).headers)
+        self.assertNotIn('Content-Encoding', self.get(HttpResponse('x' * 1000), 'identity').headers)
+        self.assertNotIn('Content-Encoding', self.get(HttpResponse('x' * 1000), 'gzip;q=0').headers)
+
+    def test_compresses_streaming_responses(self):
+        response = self.get(StreamingHttpResponse(iter([b'a' * 500, b'b' * 500]), content_type='text/html'))
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'a' * 500 + b'b' * 500)
+
+    def test_gzip_length_is_randomised(self):
+        # BREACH: the same body must not always compress to the same size.
+        lengths = {len(self.get(HttpResponse('x' * 1000)).content) for _ in range(20)}
+        self.assertGreater(len(lengths), 1)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def test_sliding_window_weights_previous_window(self):
+        cache = caches['ratelimit']
+        for _ in range(10):
+            self.assertTrue(hit(cache, 'k', 10, 60, now=59)[0])
+        # A quarter into the next window, 75% of the previous 10 still count.
+        allowed = [hit(cache, 'k', 10, 60, now=75)[0] for _ in range(4)]
+        self.assertEqual(allowed, [True, True, False, False])
+
+    def test_window_outlives_the_backend_default_timeout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FileBasedCache(directory, {})
+            hit(cache, 'k', 5, 3600, now=0)
+            # An hour later the key is still there; FileBasedCache.incr()
+            # alone would have cut it to the 300s default.
+            later = time.time() + 3600
+            with mock.patch('django.core.cache.backends.filebased.time.time', return_value=later):
+                self.assertEqual(cache.get('k:0'), 1)
+
+    def test_login_rejected_before_authentication(self):
+        User.objects.create_user('reader', password='secret')
+        for _ in range(5):
+            self.client.post(reverse('login'), {'username': 'reader', 'password': 'wrong'})
+        with mock.patch('django.contrib.auth.forms.authenticate') as authenticate, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'username': 'Reader', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        authenticate.assert_not_called()
+        self.assertEqual(len(queries), 0)
+        counters, _ = metrics.collect(None)
+        self.assertEqual(counters[('library_ratelimit_rejections_total', (('scope', 'login'),))], 1)
+
+    def test_get_requests_are_not_counted(self):
+        for _ in range(30):
+            self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+
+
+class RelationshipQueryTests(TestCase):
+    def make_catalog(self, size):
+        """``size`` authors with two books each, split over ``size`` staffed libraries."""
+        for i in range(size):
+            author = Author.objects.create(name=f'Author {i}')
+            books = [Book.objects.create(title=f'Book {i}{suffix}', author=author) for suffix in 'ab']
+            library = Library.objects.create(name=f'Library {i}')
+            library.books.set(books)
+            Librarian.objects.create(name=f'Librarian {i}', library=library)
+
+    def test_single_lookups(self):
+        self.make_catalog(2)
+        self.assertEqual([b.title for b in queries.books_by_author('Author 1')], ['Book 1a', 'Book 1b'])
+        self.assertEqual({b.title for b in queries.books_in_library('Library 0')}, {'Book 0a', 'Book 0b'})
+        self.assertEqual(queries.librarian_for_library('Library 1').name, 'Librarian 1')
+        self.assertIsNone(queries.librarian_for_library('Missing'))
+
+    def test_batched_lookups_run_one_query_each_at_any_size(self):
+        for size in (1, 25):
+            Author.objects.all().delete()
+            Library.objects.all().delete()
+            self.make_catalog(size)
+            authors = [f'Author {i}' for i in range(size)] + ['Missing']
+            libraries = [f'Library {i}' for i in range(size)] + ['Missing']
+
+            with self.assertNumQueries(1):
+                by_author = queries.books_by_authors(authors)
+                titles = [book.author.name for books in by_author.values() for book in books]
+            with self.assertNumQueries(1):
+                in_library = queries.books_in_libraries(libraries)
+                titles += [book.author.name for books in in_library.values() for book in books]
+            with self.assertNumQueries(1):
+                librarians = queries.librarians_for_libraries(libraries)
+                titles += [librarian.library.name for librarian in librarians.values() if librarian]
+
+            self.assertEqual(len(titles), 5 * size)
+            self.assertEqual(by_author['Missing'], [])
+            self.assertIsNone(librarians['Missing'])
+
+    def test_command(self):
+        self.make_catalog(1)
+        out = StringIO()
+        call_command('relationship_queries', author=['Author 0'], library=['Library 0'], stdout=out)
+        self.assertIn('Book 0a by Author 0', out.getvalue())
+        self.assertIn('librarian: Librarian 0', out.getvalue())
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Author')
+        self.a, self.b, self.c, self.d = [Book.objects.create(title=t, author=author) for t in 'abcd']
+        # a and b are always held together, c sometimes joins them, d stands alone.
+        for name, books in [('L1', [self.a, self.b]), ('L2', [self.a, self.b, self.c]), ('L3', [self.d])]:
+            Library.objects.create(name=name).books.set(books)
+
+    def test_build_ranks_by_cooccurrence(self):
+        self.assertEqual(build_similar_books(k=2), 6)
+        ranked = [entry.similar for entry in SimilarBook.objects.filter(book=self.a)]
+        self.assertEqual(ranked, [self.b, self.c])
+        self.assertFalse(SimilarBook.objects.filter(book=self.d).exists())
+
+    def test_top_k_and_single_query_lookup(self):
+        build_similar_books(k=1)
+        with self.assertNumQueries(1):
+            similar = similar_books_for([self.a, self.c, self.d])
+            names = {pk: [book.author.name for book in books] for pk, books in similar.items()}
+        self.assertEqual(similar[self.a.pk], [self.b])
+        self.assertEqual(len(similar[self.c.pk]), 1)
+        self.assertEqual(names[self.d.pk], [])
+
+    def test_archived_books_and_libraries_are_left_out(self):
+        archive_libraries(Library.objects.filter(name='L2'))
+        build_similar_books(k=2)
+        self.assertEqual([entry.similar for entry in SimilarBook.objects.filter(book=self.a)], [self.b])
+        self.assertFalse(SimilarBook.objects.filter(book=self.c).exists())
+
+        Book.objects.filter(pk=self.b.pk).update(archived_at=timezone.now())
+        self.assertEqual(similar_books_for([self.a])[self.a.pk], [])
+        build_similar_books(k=2)
+        self.assertFalse(SimilarBook.objects.filter(similar=self.b).exists())
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name='Author')
+        self.book = Book.objects.create(title='Book', author=self.author)
+        self.library = Library.objects.create(name='Central')
+
+    def log(self):
+        return [(entry.model, entry.object_id, entry.action) for entry in ChangeLogEntry.objects.all()]
+
+    def test_changes_are_logged_in_order(self):
+        self.library.books.add(self.book)
+        self.book.title = 'Renamed'
+        self.book.save()
+        self.book.library_set.clear()
+        author_id = str(self.author.pk)
+        self.author.delete()
+        self.assertEqual(self.log(), [
+            ('author', author_id, 'create'),
+            ('book', str(self.book.pk), 'create'),
+            ('library', str(self.library.pk), 'create'),
+            ('library_books', f'{self.library.pk}:{self.book.pk}', 'add'),
+            ('book', str(self.book.pk), 'update'),
+            ('library_books', f'{self.library.pk}:{self.book.pk}', 'remove'),
+            ('book', str(self.book.pk), 'delete'),
+            ('author', author_id, 'delete'),
+        ])
+        self.assertEqual(ChangeLogEntry.objects.get(action='update').data['title'], 'Renamed')
+
+    def test_rolled_back_change_leaves_no_entry(self):
+        before = ChangeLogEntry.objects.count()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Librarian.objects.create(name='Temp', library=self.library)
+            raise RuntimeError
+        self.assertEqual(ChangeLogEntry.objects.count(), before)
+
+    def test_feed_pages_by_cursor(self):
+        user = User.objects.create_user('sync', password='secret')
+        user.user_permissions.add(Permission.objects.get(codename='view_changelogentry'))
+        self.client.force_login(user)
+
+        first = self.client.get(reverse('change_feed'), {'limit': 2}).json()
+        self.assertEqual([r['model'] for r in first['results']], ['author', 'book'])
+        self.assertTrue(first['has_more'])
+        rest = self.client.get(reverse('change_feed'), {'after': first['next_cursor']}).json()
+        self.assertEqual([r['model'] for r in rest['results']], ['library'])
+        self.assertFalse(rest['has_more'])
+
+    def test_feed_requires_permission(self):
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertEqual(self.client.get(reverse('change_feed')).status_code, 403)
+
+    def test_compaction_keeps_latest_entry_per_object(self):
+        for title in ('Two', 'Three'):
+            self.book.title = title
+            self.book.save()
+        call_command('compact_changelog', older_than_days=0, stdout=StringIO())
+        self.assertEqual(self.log(), [
+            ('author', str(self.author.pk), 'create'),
+            ('library', str(self.library.pk), 'create'),
+            ('book', str(self.book.pk), 'update'),
+        ])
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name='Prolific')
+        self.other = Author.objects.create(name='Other')
+        self.books = Book.objects.bulk_create([Book(title=f'Book {i}', author=self.author) for i in range(30)])
+        self.kept = Book.objects.create(title='Kept', author=self.other)
+        self.library = Library.objects.create(name='Central')
+        self.library.books.set(self.books + [self.kept])
+        Librarian.objects.create(name='Librarian', library=self.library)
+
+    def test_archived_rows_are_hidden_but_not_deleted(self):
+        archive_authors(Author.objects.filter(pk=self.author.pk))
+        self.assertEqual(list(Author.objects.all()), [self.other])
+        self.assertEqual(list(self.library.books.all()), [self.kept])
+        self.assertEqual(Book.all_objects.count(), 31)
+        self.assertEqual(ChangeLogEntry.objects.filter(action='delete', model='book').count(), 30)
+
+        archive_libraries(Library.objects.all())
+        self.assertFalse(Library.objects.exists())
+        self.assertFalse(Librarian.objects.exists())
+        self.assertTrue(Librarian.all_objects.exists())
+
+    def test_archived_library_is_gone_from_queries(self):
+        archive_libraries(Library.objects.filter(pk=self.library.pk))
+        self.assertEqual(list(queries.books_in_library('Central')), [])
+        self.assertEqual(queries.books_in_libraries(['Central']), {'Central': []})
+
+    def test_purge_deletes_in_bounded_batches(self):
+        archive_authors(Author.objects.filter(pk=self.author.pk))
+        archive_libraries(Library.objects.all())
+        logged = ChangeLogEntry.objects.count()
+
+        batches = list(purge_archived(batch_size=7))
+        self.assertTrue(all(rows <= 7 for _, rows in batches))
+        self.assertEqual(Book.all_objects.get(), self.kept)
+        self.assertEqual(list(Author.all_objects.all()), [self.other])
+        self.assertFalse(Library.all_objects.exists())
+        self.assertFalse(Library.books.through.objects.exists())
+        # Purged rows were already reported as deleted when archived.
+        self.assertEqual(ChangeLogEntry.objects.count(), logged)
+
+    def test_admin_archives_instead_of_deleting(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        response = self.client.post(reverse('admin:relationship_app_author_changelist'), {
+            'action': 'archive_selected',
+            '_selected_action': [self.author.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Author.all_objects.get(pk=self.author.pk).is_archived)
+        self.assertEqual(Book.objects.get(), self.kept)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        caches['default'].clear()
+
+    def test_requests_and_streamed_queries_are_counted_by_view(self):
+        author = Author.objects.create(name='Author')
+        Book.objects.bulk_create([Book(title=f'Book {i}', author=author) for i in range(3)])
+        response = self.client.get(reverse('book_list'))
+        b''.join(response.streaming_content)
+
+        counters, histograms = metrics.collect(None)
+        self.assertEqual(counters[('library_http_requests_total', (
+            ('method', 'GET'), ('status', '200'), ('view', 'book_list'),
+        ))], 1)
+        self.assertEqual(counters[('library_db_queries_total', (('view', 'book_list'),))], 1)
+        self.assertEqual(sum(histograms[('library_http_request_duration_seconds', (('view', 'book_list'),))][:-1]), 1)
+
+    def test_snapshots_from_other_processes_are_merged(self):
+        metrics.registry.inc('library_db_queries_total', {'view': 'x'}, 2)
+        with tempfile.TemporaryDirectory() as directory:
+            metrics.registry.flush(directory)
+            # Pretend the file just written came from another worker.
+            (snapshot,) = os.listdir(directory)
+            os.rename(os.path.join(directory, snapshot), os.path.join(directory, '1-0.json'))
+            with open(os.path.join(directory, 'broken.json'), 'w') as f:
+                f.write('{')
+            counters, _ = metrics.collect(directory)
+        self.assertEqual(counters[('library_db_queries_total', (('view', 'x'),))], 4)
+
+    def test_every_request_is_written_to_the_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS={'MULTIPROCESS_DIR': directory}):
+                for _ in range(2):
+                    b''.join(self.client.get(reverse('book_list')).streaming_content)
+            with open(os.path.join(directory, metrics.registry.filename)) as f:
+                snapshot = json.load(f)
+        requests = [value for name, _, value in snapshot['counters'] if name == 'library_http_requests_total']
+        self.assertEqual(requests, [2])
+
+    def test_snapshot_filename_changes_after_fork(self):
+        before = metrics.registry.filename
+        metrics.registry.reset()
+        self.assertTrue(metrics.registry.filename.startswith(f'{os.getpid()}-'))
+        self.assertNotEqual(metrics.registry.filename, before)
+
+    def test_exited_processes_are_folded_into_one_snapshot(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        metrics.registry.inc('library_db_queries_total', {'view': 'x'}, 2)
+        with tempfile.TemporaryDirectory() as directory:
+            for worker in range(2):
+                metrics.registry.flush(directory)
+                os.rename(
+                    os.path.join(directory, metrics.registry.filename),
+                    os.path.join(directory, f'{process.pid}-{worker}.json'),
+                )
+            first, _ = metrics.collect(directory)
+            remaining = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+            second, _ = metrics.collect(directory)
+        self.assertEqual(remaining, [metrics.EXITED])
+        self.assertEqual(first[('library_db_queries_total', (('view', 'x'),))], 6)
+        self.assertEqual(second, first)
+
+    def test_instrumented_cache_counts_hits_and_misses(self):
+        cache = metrics.InstrumentedLocMemCache('metrics-test', {'OPTIONS': {'METRICS_ALIAS': 'test'}})
+        cache.set('present', 1)
+        self.assertEqual(cache.get_many(['present', 'absent']), {'present': 1})
+        self.assertIsNone(cache.get('absent'))
+        counters, _ = metrics.collect(None)
+        self.assertEqual(counters[('library_cache_requests_total', (('cache', 'test'), ('result', 'hit')))], 1)
+        self.assertEqual(counters[('library_cache_requests_total', (('cache', 'test'), ('result', 'miss')))], 2)
+
+    def test_exposition_format(self):
+        Author.objects.create(name='Author')
+        metrics.registry.observe('library_http_request_duration_seconds', {'view': 'x'}, 0.02)
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE library_http_request_duration_seconds histogram\n', body)
+        self.assertIn('library_http_request_duration_seconds_bucket{view="x",le="0.01"} 0\n', body)
+        self.assertIn('library_http_request_duration_seconds_bucket{view="x",le="0.025"} 1\n', body)
+        self.assertIn('library_http_request_duration_seconds_count{view="x"} 1\n', body)
+        self.assertIn('library_catalog_objects{model="author"} 1\n', body)
+
+    @override_settings(METRICS={'ALLOWED_IPS': ['10.0.0.0/8'], 'TOKEN': 'secret'})
+    def test_access_needs_an_allowed_address_or_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', headers={'authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'authorization': 'Bearer secret'}).status_code, 200)
+
+
+class RoutingTests(TestCase):
+    def test_every_route_resolves_to_itself(self):
+        # An earlier, broader pattern would win and report its own route.
+        for route, pattern in iter_routes(get_resolver().url_patterns):
+            with self.subTest(route=route):
+                self.assertEqual(resolve(sample_path(route)).route, route)
+
+    def test_no_route_starts_with_a_converter(self):
+        for pattern in urls.urlpatterns:
+            with self.subTest(route=str(pattern.pattern)):
+                self.assertNotRegex(str(pattern.pattern), r'^<')
+
+    def test_route_names_are_unique(self):
+        names = [pattern.name for pattern in urls.urlpatterns]
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_dashboards_are_reachable(self):
+        user = User.objects.create_user('librarian', password='secret')
+        user.profile.role = 'Librarian'
+        user.profile.save()
+        self.client.force_login(user)
+        response = self.client.get(reverse('librarian_view'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'relationship_app/librarian_view.html')
+
+    def test_old_book_list_address_redirects(self):
+        response = self.client.get(reverse('book_list_func'), {'page': 2})
+        self.assertRedirects(response, reverse('book_list') + '?page=2', status_code=301, fetch_redirect_response=False)
+
+    def test_login_redirects_follow_the_urlconf(self):
+        response = self.client.get(reverse('member_view'))
+        self.assertRedirects(response, f'{reverse("login")}?next={reverse("member_view")}')
+
+
+class StartupTests(SimpleTestCase):
+    def test_numpy_and_scipy_are_not_imported_at_startup(self):
+        lazy = ['numpy', 'scipy']
+        code = (
+            'import sys, django; django.setup(); '
+            'from django.urls import get_resolver; get_resolver().url_patterns; '
+            f'print([name for name in {lazy!r} if name in sys.modules])'
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'LibraryProject.settings_test'}
+        result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_preload_compiles_templates(self):
+        result = preload(freeze=False)
+        self.assertGreaterEqual(result['templates'], 10)
+
+    def test_parse_importtime(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   relationship_app.models\n'
+            'import time:        30 |        150 | relationship_app\n'
+        )
+        self.assertEqual(parse_importtime(stderr), [
+            ('relationship_app.models', 120, 120, 1),
+            ('relationship_app', 30, 150, 0),
+        ])
+
+
+# The shard databases are defined in LibraryProject.settings_test only.
+SHARDS = {'shard_0', 'shard_1'}
+HAS_SHARDS = SHARDS <= set(settings.DATABASES)
+
+
+@skipUnless(HAS_SHARDS, 'run with --settings=LibraryProject.settings_test for the shard databases')
+@override_settings(LIBRARY_SHARDS=sorted(SHARDS))
+class ShardingTests(TestCase):
+    # The runner sets up every alias named here, even for skipped classes.
+    databases = {'default', *SHARDS} if HAS_SHARDS else {'default'}
+
+    def setUp(self):
+        # One library name per shard.
+        names = (f'Branch {i}' for i in range(100))
+        self.names = {}
+        for name in names:
+            self.names.setdefault(shard_for(name), name)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author = Author.objects.create(name='Author')
+            self.books = [Book.objects.create(title=f'Book {i}', author=self.author) for i in range(3)]
+        self.libraries = {}
+        for shard, name in self.names.items():
+            library = Library.objects.create(name=name)
+            library.books.add(*self.books[:2] if shard == 'shard_0' else self.books)
+            Librarian.objects.create(name=f'{name} librarian', library=library)
+            self.libraries[shard] = library
+
+    def test_library_memberships_and_librarian_share_a_shard(self):
+        self.assertEqual(sorted(self.names), ['shard_0', 'shard_1'])
+        for shard, library in self.libraries.items():
+            self.assertEqual(library._state.db, shard)
+            self.assertEqual(Librarian.objects.using(shard).get().library_id, library.pk)
+            self.assertEqual(library.books.count(), 2 if shard == 'shard_0' else 3)
+        self.assertFalse(Library.objects.using('default').exists())
+        self.assertEqual(ChangeLogEntry.objects.using('shard_1').filter(model='library_books').count(), 3)
+
+    def test_catalog_copies_follow_saves_and_deletes(self):
+        book = self.books[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            book.title = 'Renamed'
+            book.save()
+        self.assertEqual(Book.objects.using('shard_1').get(pk=book.pk).title, 'Renamed')
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertFalse(Book.objects.using('shard_1').filter(pk=book.pk).exists())
+        self.assertEqual(self.libraries['shard_1'].books.count(), 2)
+        # Copies are not logged a second time.
+        self.assertFalse(ChangeLogEntry.objects.using('shard_1').filter(model='book').exists())
+
+    def test_book_created_in_a_transaction_can_join_a_library(self):
+        library = self.libraries['shard_1']
+        with transaction.atomic():
+            book = Book.objects.create(title='New', author=Author.objects.create(name='New author'))
+            library.books.add(book)
+        # The shard's deferred foreign keys are checked here, as at commit.
+        connections['shard_1'].check_constraints()
+        self.assertEqual(Book.objects.using('shard_1').get(pk=book.pk).author.name, 'New author')
+        self.assertIn(book, library.books.all())
+
+    def test_detail_view_only_queries_the_library_shard(self):
+        name = self.names['shard_1']
+        with self.assertNumQueries(0, using='default'), self.assertNumQueries(2, using='shard_1'):
+            response = self.client.get(reverse('library_detail', args=[name]))
+            body = b''.join(response.streaming_content).decode()
+        self.assertIn('Book 2', body)
+
+    def test_librarian_view_and_counts_fan_out(self):
+        user = User.objects.create_user('librarian', password='secret')
+        user.profile.role = 'Librarian'
+        user.profile.save()
+        self.client.force_login(user)
+        response = self.client.get(reverse('librarian_view'))
+        counts = {library.name: library.book_count for library in response.context['libraries']}
+        self.assertEqual(counts, {self.names['shard_0']: 2, self.names['shard_1']: 3})
+        self.assertEqual(catalog_counts(), {'author': 1, 'book': 3, 'library': 2, 'librarian': 2})
+
+    def test_queries_route_by_library_name(self):
+        names = list(self.names.values())
+        self.assertEqual(len(queries.books_in_library(self.names['shard_1'])), 3)
+        self.assertEqual(queries.librarian_for_library(self.names['shard_0']).library, self.libraries['shard_0'])
+        self.assertEqual({name: len(books) for name, books in queries.books_in_libraries(names).items()}, {
+            self.names['shard_0']: 2, self.names['shard_1']: 3,
+        })
+
+    def test_archive_and_purge_on_a_shard(self):
+        archive_libraries(Library.objects.using('shard_1'))
+        self.assertFalse(Library.objects.using('shard_1').exists())
+        self.assertTrue(Library.objects.using('shard_0').exists())
+        labels = dict(purge_archived())
+        self.assertEqual(labels['libraries (shard_1)'], 1)
+        self.assertFalse(Library.all_objects.using('shard_1').exists())
+
+    def test_compact_changelog_covers_every_shard(self):
+        librarian = Librarian.objects.using('shard_1').get()
+        for name in ('Renamed', 'Renamed again'):
+            librarian.name = name
+            librarian.save()
+        call_command('compact_changelog', older_than_days=0, stdout=StringIO())
+        entries = ChangeLogEntry.objects.using('shard_1').filter(model='librarian')
+        self.assertEqual([(entry.action, entry.data['name']) for entry in entries], [('update', 'Renamed again')])
+        self.assertEqual(ChangeLogEntry.objects.using('shard_0').filter(model='librarian').count(), 1)
+
+    def test_rename_onto_another_shard_is_rejected(self):
+        library = self.libraries['shard_1']
+        library.name = self.names['shard_0']
+        with self.assertRaises(ValueError), transaction.atomic(using='shard_1'):
+            library.save()
+        self.assertEqual(Library.objects.using('shard_1').get().name, self.names['shard_1'])
+
+        library.name = next(f'Annex {i}' for i in range(100) if shard_for(f'Annex {i}') == 'shard_1')
+        library.save()
+        response = self.client.get(reverse('library_detail', args=[library.name]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_shows_one_shard_and_keeps_it(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        url = reverse('admin:relationship_app_library_changelist')
+        response = self.client.get(url, {'shard': 'shard_1'})
+        self.assertContains(response, self.names['shard_1'])
+        self.assertNotContains(response, self.names['shard_0'])
+
+        library = self.libraries['shard_1']
+        change_url = reverse('admin:relationship_app_library_change', args=[library.pk])
+        response = self.client.get(change_url, {'_changelist_filters': 'shard=shard_1'})
+        self.assertEqual(response.context['original'], library)
+        self.assertEqual(response.context['original']._state.db, 'shard_1')
+
+        # A library added while browsing shard_1 lands on its own shard and
+        # the admin follows it there.
+        name = next(f'New {i}' for i in range(100) if shard_for(f'New {i}') == 'shard_0')
+        response = self.client.post(
+            reverse('admin:relationship_app_library_add') + '?_changelist_filters=shard%3Dshard_1',
+            {'name': name, 'books': [self.books[0].pk], '_continue': '1'},
+        )
+        added = Library.objects.using('shard_0').get(name=name)
+        self.assertRedirects(
+            response,
+            reverse('admin:relationship_app_library_change', args=[added.pk]) + '?_changelist_filters=shard%3Dshard_0',
+        )
+
+    def test_shard_libraries_moves_libraries_home(self):
+        name = self.names['shard_1']
+        stray = Library(name=name)
+        stray.save(using='shard_0')
+        stray.books.add(self.books[2])
+        Librarian(name='Stray librarian', library=stray).save()
+
+        call_command('shard_libraries', stdout=StringIO())
+        self.assertFalse(Library.all_objects.using('shard_0').filter(name=name).exists())
+        moved = Library.objects.using('shard_1').filter(name=name).exclude(pk=self.libraries['shard_1'].pk).get()
+        self.assertEqual(list(moved.books.all()), [self.books[2]])
+        self.assertEqual(moved.librarian.name, 'Stray librarian')
@@ -15,35 +15,40 @@
 
 from django.urls import path
 from django.contrib.auth import views as auth_views
+from django.views.generic import RedirectView
 from . import views
-from .views import list_books, LibraryDetailView, list_book
-
+from .ratelimit import ratelimit
+
+# Throttle by address first, then by the account being tried, so credential
+# stuffing is turned away before the password hasher runs.
+login_view = ratelimit('login', '20/m')(
+    ratelimit('login', '5/m', key='username')(
+        auth_views.LoginView.as_view(template_name='relationship_app/login.html')
+    )
+)
+
+# Every route starts with a literal segment, so no pattern can swallow
+# another one's URLs; tests.RoutingTests checks this stays true.
 urlpatterns = [
-    path('', list_book.as_view(), name='book_list'),
-    path('list/', list_books, name='book_list_func'),
-    path('login/', auth_views.LoginView.as_view(template_name='relationship_app/login.html'), name='login'),
+    path('', views.list_books, name='book_list'),
+    # Old address of the book list, kept for bookmarks.
+    path('list/', RedirectView.as_view(pattern_name='book_list', permanent=True, query_string=True), name='book_list_func'),
+    path('login/', login_view, name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('register/', views.register, name='register'),
-    path('<str:title>/', LibraryDetailView.as_view(), name='library_detail'),
-    
+
+    # Change feed for downstream sync
+    path('changes/', views.change_feed, name='change_feed'),
+
     # Role-based view URLs
     path('admin/', views.admin_view, name='admin_view'),
     path('librarian/', views.librarian_view, name='librarian_view'),
     path('member/', views.member_view, name='member_view'),
-    
+
     # Book management URLs with permissions
     path('add_book/', views.add_book, name='add_book'),
     path('edit_book/<int:book_id>/', views.edit_book, name='edit_book'),
     path('delete_book/<int:book_id>/', views.delete_book, name='delete_book'),
-    
-    # Book management URLs
-    path('books/', views.list_books, name='book_list'),
+
     path('library/<str:title>/', views.LibraryDetailView.as_view(), name='library_detail'),
 ]
-# add_book/
-
-# delete_book/
-
-# edit_book/
-
-
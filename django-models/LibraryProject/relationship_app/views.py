@@ -50,20 +50,18 @@ from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.models import User
 from django.views.generic.detail import DetailView
 from django.contrib import messages
-from .models import Book, Library
+from django.db.models import Count
+from django.http import JsonResponse
+from .models import Book, ChangeLogEntry, Library
+from .ratelimit import ratelimit
+from .recommendations import similar_books_for
+from .sharding import all_aliases, fan_out, shard_for
+from .streaming import stream_template
 
 # Existing views
 def list_books(request):
-    books = Book.objects.all()
-    return render(request, 'relationship_app/list_books.html', {'books': books})
-
-class list_book(DetailView):
-    model = Book
-    template_name = 'relationship_app/list_books.html'
-    context_object_name = 'books'
-    
-    def get_queryset(self):
-        return Book.objects.all()
+    books = Book.objects.all().select_related('author')
+    return stream_template(request, 'relationship_app/list_books.html', {}, 'relationship_app/book_rows.html', books)
 
 class LibraryDetailView(DetailView):
     model = Library
@@ -72,6 +70,17 @@ class LibraryDetailView(DetailView):
     slug_field = 'name'
     slug_url_kwarg = 'title'
 
+    def get_queryset(self):
+        # The library's name is its tenant key, so only its shard is asked.
+        return Library.objects.using(shard_for(self.kwargs[self.slug_url_kwarg]))
+
+    def render_to_response(self, context, **response_kwargs):
+        books = self.object.books.select_related('author')
+        return stream_template(
+            self.request, self.template_name, context, 'relationship_app/library_book_rows.html', books
+        )
+
+@ratelimit('register', '5/h')
 def register(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -97,7 +106,7 @@ def is_member(user):
     return user.is_authenticated and hasattr(user, 'profile') and user.profile.role == 'Member'
 
 # Role-based views
-@user_passes_test(is_admin, login_url='/login/')
+@user_passes_test(is_admin)
 def admin_view(request):
     """Admin view - only accessible to Admin users"""
     context = {
@@ -109,31 +118,43 @@ def admin_view(request):
     }
     return render(request, 'relationship_app/admin_view.html', context)
 
-@user_passes_test(is_librarian, login_url='/login/')
+@user_passes_test(is_librarian)
 def librarian_view(request):
     """Librarian view - only accessible to Librarian users"""
     context = {
         'user': request.user,
         'role': request.user.profile.role,
         'message': 'Welcome to the Librarian Dashboard!',
-        'books': Book.objects.all(),
-        'libraries': Library.objects.all(),
+        'books': Book.objects.all().select_related('author'),
+        'libraries': [
+            library
+            for libraries in fan_out(
+                lambda alias: Library.objects.using(alias).annotate(book_count=Count('books'))
+            ).values()
+            for library in libraries
+        ],
     }
     return render(request, 'relationship_app/librarian_view.html', context)
 
-@user_passes_test(is_member, login_url='/login/')
+@user_passes_test(is_member)
 def member_view(request):
     """Member view - only accessible to Member users"""
+    books = list(Book.objects.all().select_related('author')[:10])  # Show only 10 books for members
+    similar = similar_books_for(books)
+    for book in books:
+        book.similar_books = similar[book.pk]
     context = {
         'user': request.user,
         'role': request.user.profile.role,
         'message': 'Welcome to the Member Dashboard!',
-        'books': Book.objects.all()[:10],  # Show only 10 books for members
+        'books': books,
     }
     return render(request, 'relationship_app/member_view.html', context)
 
 # Permission-based book management views
-@permission_required('relationship_app.can_add_book', login_url='/login/')
+@ratelimit('add_book', '60/m')
+@permission_required('relationship_app.can_add_book')
+@ratelimit('add_book', '20/m', key='user')
 def add_book(request):
     """Add a new book - requires can_add_book permission"""
     if request.method == 'POST':
@@ -154,7 +175,7 @@ def add_book(request):
     
     return render(request, 'relationship_app/add_book.html')
 
-@permission_required('relationship_app.can_change_book', login_url='/login/')
+@permission_required('relationship_app.can_change_book')
 def edit_book(request, book_id):
     """Edit an existing book - requires can_change_book permission"""
     book = get_object_or_404(Book, id=book_id)
@@ -170,7 +191,7 @@ def edit_book(request, book_id):
     
     return render(request, 'relationship_app/edit_book.html', {'book': book})
 
-@permission_required('relationship_app.can_delete_book', login_url='/login/')
+@permission_required('relationship_app.can_delete_book')
 def delete_book(request, book_id):
     """Delete a book - requires can_delete_book permission"""
     book = get_object_or_404(Book, id=book_id)
@@ -183,3 +204,46 @@ def delete_book(request, book_id):
     
     return render(request, 'relationship_app/delete_book.html', {'book': book})
     return render(request, 'relationship_app/delete_book.html', {'book': book})
+
+# Change feed for downstream sync
+CHANGE_FEED_MAX_LIMIT = 1000
+
+@permission_required('relationship_app.view_changelogentry', raise_exception=True)
+def change_feed(request):
+    """
+    Catalog changes after ?after=<cursor>, oldest first, at most ?limit= per page.
+
+    Consumers store next_cursor and pass it back as ``after``; each call is
+    an index range scan on the primary key, so cost grows with the number
+    of new changes rather than the catalog size.
+
+    Library, librarian and membership changes are logged on the library's
+    shard; read them with ?shard=<alias>. Each shard has its own cursor.
+    """
+    try:
+        after = max(int(request.GET.get('after', 0)), 0)
+        limit = min(max(int(request.GET.get('limit', 500)), 1), CHANGE_FEED_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'after and limit must be integers'}, status=400)
+    shard = request.GET.get('shard', 'default')
+    if shard not in all_aliases():
+        return JsonResponse({'error': f'unknown shard {shard!r}'}, status=400)
+
+    entries = list(ChangeLogEntry.objects.using(shard).filter(id__gt=after).order_by('id')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return JsonResponse({
+        'results': [
+            {
+                'cursor': entry.id,
+                'model': entry.model,
+                'object_id': entry.object_id,
+                'action': entry.action,
+                'data': entry.data,
+                'created_at': entry.created_at,
+            }
+            for entry in entries
+        ],
+        'next_cursor': entries[-1].id if entries else after,
+        'has_more': has_more,
+    })